@@ -10,22 +10,14 @@ import sqlite3
 from datetime import datetime
 from pathlib import Path
 import re
+from multiprocessing import Pool
 from pypdf import PdfReader
 
 # Import functions from main app
 from app import extract_entities, get_db, init_db, ALLOWED_EXTENSIONS
 
-def bulk_import_directory(directory_path, recursive=True):
-    """Import all allowed files from a directory"""
-
-    if not os.path.isdir(directory_path):
-        print(f"Error: '{directory_path}' is not a valid directory")
-        return
-
-    # Initialize database
-    init_db()
-
-    # Find all files
+def find_importable_files(directory_path, recursive=True):
+    """All files under directory_path with an allowed extension"""
     directory = Path(directory_path)
     if recursive:
         pattern = '**/*'
@@ -38,6 +30,172 @@ def bulk_import_directory(directory_path, recursive=True):
             ext = file_path.suffix[1:].lower()  # Remove the dot
             if ext in ALLOWED_EXTENSIONS:
                 files_to_import.append(file_path)
+    return files_to_import
+
+def import_file(c, file_path):
+    """Copy one file into uploads/ and index it. Returns True if imported, False if already present"""
+    filename = file_path.name
+    ext = file_path.suffix[1:].lower()
+
+    # Check if already imported
+    c.execute('SELECT id FROM documents WHERE filename = ?', (filename,))
+    if c.fetchone():
+        print(f"⊘ Skipping (already exists): {filename}")
+        return False
+
+    # Determine file type and destination
+    if ext in ('txt', 'pdf'):
+        file_type = 'txt'
+        dest_dir = Path('uploads/txt')
+    else:
+        file_type = 'image'
+        dest_dir = Path('uploads/images')
+
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    dest_path = dest_dir / filename
+
+    # Handle filename conflicts - created exclusively, so a name another pool
+    # worker takes first moves on to the next counter instead of being overwritten
+    counter = 1
+    original_dest = dest_path
+    while True:
+        try:
+            dst = open(dest_path, 'xb')
+            break
+        except FileExistsError:
+            stem = original_dest.stem
+            suffix = original_dest.suffix
+            dest_path = dest_dir / f"{stem}_{counter}{suffix}"
+            counter += 1
+
+    # Copy file
+    with open(file_path, 'rb') as src:
+        with dst:
+            dst.write(src.read())
+
+    # Read content for text files and PDFs
+    content = ''
+    if ext == 'txt':
+        with open(dest_path, 'r', encoding='utf-8', errors='ignore') as f:
+            content = f.read()
+    elif ext == 'pdf':
+        try:
+            reader = PdfReader(dest_path)
+            content = ''
+            for page in reader.pages:
+                content += page.extract_text() + '\n'
+        except Exception as e:
+            content = f'[PDF extraction failed: {e}]'
+
+    # Insert into database
+    uploaded_date = datetime.now().isoformat()
+    c.execute('''INSERT INTO documents (filename, filepath, file_type, content, uploaded_date)
+                VALUES (?, ?, ?, ?, ?)''',
+             (dest_path.name, str(dest_path), file_type, content, uploaded_date))
+    doc_id = c.lastrowid
+
+    # Add to full-text search and extract entities
+    if file_type == 'txt':
+        c.execute('INSERT INTO documents_fts (doc_id, filename, content) VALUES (?, ?, ?)',
+                 (doc_id, dest_path.name, content))
+
+        # Extract entities
+        entities = extract_entities(content)
+
+        # Store entities
+        for entity_type, entity_names in entities.items():
+            for name in entity_names:
+                # Insert or update entity
+                entity_type_singular = entity_type[:-1]  # Remove 's' from type
+                c.execute('''INSERT INTO entities (name, entity_type, mention_count)
+                            VALUES (?, ?, 1)
+                            ON CONFLICT(name, entity_type) DO UPDATE SET
+                            mention_count = mention_count + 1''',
+                         (name, entity_type_singular))
+                entity_id = c.lastrowid
+
+                # Get entity_id if it already existed
+                if entity_id == 0:
+                    c.execute('SELECT id FROM entities WHERE name = ? AND entity_type = ?',
+                            (name, entity_type_singular))
+                    entity_id = c.fetchone()[0]
+
+                # Create mention
+                context = content[:200] if len(content) > 200 else content
+                c.execute('''INSERT INTO entity_mentions (doc_id, entity_id, context)
+                            VALUES (?, ?, ?)''',
+                         (doc_id, entity_id, context))
+
+    print(f"✓ Imported: {filename} ({file_type})")
+    return True
+
+# How long a pool worker waits for another worker's write lock (ms)
+WORKER_BUSY_TIMEOUT = 60000
+
+# Connection owned by this process when running as a pool worker
+_worker_conn = None
+
+def init_import_worker():
+    """Pool initializer - one database connection per worker process"""
+    global _worker_conn
+    _worker_conn = get_db()
+    _worker_conn.execute(f'PRAGMA busy_timeout={WORKER_BUSY_TIMEOUT}')
+
+def import_one(file_path):
+    """Import a single file on this worker's connection. Returns 'imported', 'skipped' or 'error'"""
+    if _worker_conn is None:
+        init_import_worker()
+
+    file_path = Path(file_path)
+    try:
+        with _worker_conn:
+            imported = import_file(_worker_conn.cursor(), file_path)
+        return 'imported' if imported else 'skipped'
+    except Exception as e:
+        print(f"✗ Error importing {file_path.name}: {str(e)}")
+        return 'error'
+
+def import_documents_to_db(directory_path, recursive=True, processes=None):
+    """Import a directory with PDF extraction spread over a process pool. Returns counts"""
+    files_to_import = find_importable_files(directory_path, recursive)
+    if not files_to_import:
+        return {'imported': 0, 'skipped': 0, 'errors': 0}
+
+    # Create tables once up front rather than racing in every worker
+    init_db()
+
+    # Workers would race on the "already imported" check for files sharing a
+    # name, so only the first of each goes to the pool, as in a sequential import
+    unique_files = {}
+    for file_path in files_to_import:
+        if file_path.name in unique_files:
+            print(f"⊘ Skipping (already exists): {file_path.name}")
+        else:
+            unique_files[file_path.name] = file_path
+    duplicate_count = len(files_to_import) - len(unique_files)
+
+    # One file per task - PDF sizes vary far too much for bigger chunks
+    with Pool(processes, initializer=init_import_worker) as pool:
+        results = pool.map(import_one, unique_files.values(), chunksize=1)
+
+    return {
+        'imported': results.count('imported'),
+        'skipped': results.count('skipped') + duplicate_count,
+        'errors': results.count('error'),
+    }
+
+def bulk_import_directory(directory_path, recursive=True):
+    """Import all allowed files from a directory"""
+
+    if not os.path.isdir(directory_path):
+        print(f"Error: '{directory_path}' is not a valid directory")
+        return
+
+    # Initialize database
+    init_db()
+
+    # Find all files
+    files_to_import = find_importable_files(directory_path, recursive)
 
     if not files_to_import:
         print(f"No files with allowed extensions ({', '.join(ALLOWED_EXTENSIONS)}) found in {directory_path}")
@@ -55,96 +213,10 @@ def bulk_import_directory(directory_path, recursive=True):
 
     for file_path in files_to_import:
         try:
-            filename = file_path.name
-            ext = file_path.suffix[1:].lower()
-
-            # Check if already imported
-            c.execute('SELECT id FROM documents WHERE filename = ?', (filename,))
-            if c.fetchone():
-                print(f"⊘ Skipping (already exists): {filename}")
-                skipped_count += 1
-                continue
-
-            # Determine file type and destination
-            if ext in ('txt', 'pdf'):
-                file_type = 'txt'
-                dest_dir = Path('uploads/txt')
+            if import_file(c, file_path):
+                imported_count += 1
             else:
-                file_type = 'image'
-                dest_dir = Path('uploads/images')
-
-            dest_dir.mkdir(parents=True, exist_ok=True)
-            dest_path = dest_dir / filename
-
-            # Handle filename conflicts
-            counter = 1
-            original_dest = dest_path
-            while dest_path.exists():
-                stem = original_dest.stem
-                suffix = original_dest.suffix
-                dest_path = dest_dir / f"{stem}_{counter}{suffix}"
-                counter += 1
-
-            # Copy file
-            with open(file_path, 'rb') as src:
-                with open(dest_path, 'wb') as dst:
-                    dst.write(src.read())
-
-            # Read content for text files and PDFs
-            content = ''
-            if ext == 'txt':
-                with open(dest_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-            elif ext == 'pdf':
-                try:
-                    reader = PdfReader(dest_path)
-                    content = ''
-                    for page in reader.pages:
-                        content += page.extract_text() + '\n'
-                except Exception as e:
-                    content = f'[PDF extraction failed: {e}]'
-
-            # Insert into database
-            uploaded_date = datetime.now().isoformat()
-            c.execute('''INSERT INTO documents (filename, filepath, file_type, content, uploaded_date)
-                        VALUES (?, ?, ?, ?, ?)''',
-                     (dest_path.name, str(dest_path), file_type, content, uploaded_date))
-            doc_id = c.lastrowid
-
-            # Add to full-text search and extract entities
-            if file_type == 'txt':
-                c.execute('INSERT INTO documents_fts (doc_id, filename, content) VALUES (?, ?, ?)',
-                         (doc_id, dest_path.name, content))
-
-                # Extract entities
-                entities = extract_entities(content)
-
-                # Store entities
-                for entity_type, entity_names in entities.items():
-                    for name in entity_names:
-                        # Insert or update entity
-                        entity_type_singular = entity_type[:-1]  # Remove 's' from type
-                        c.execute('''INSERT INTO entities (name, entity_type, mention_count)
-                                    VALUES (?, ?, 1)
-                                    ON CONFLICT(name, entity_type) DO UPDATE SET
-                                    mention_count = mention_count + 1''',
-                                 (name, entity_type_singular))
-                        entity_id = c.lastrowid
-
-                        # Get entity_id if it already existed
-                        if entity_id == 0:
-                            c.execute('SELECT id FROM entities WHERE name = ? AND entity_type = ?',
-                                    (name, entity_type_singular))
-                            entity_id = c.fetchone()[0]
-
-                        # Create mention
-                        context = content[:200] if len(content) > 200 else content
-                        c.execute('''INSERT INTO entity_mentions (doc_id, entity_id, context)
-                                    VALUES (?, ?, ?)''',
-                                 (doc_id, entity_id, context))
-
-            print(f"✓ Imported: {filename} ({file_type})")
-            imported_count += 1
+                skipped_count += 1
 
         except Exception as e:
             print(f"✗ Error importing {file_path.name}: {str(e)}")
@@ -79,9 +79,21 @@ def init_contradiction_tables():
                   detected_date TEXT NOT NULL,
                   verified BOOLEAN DEFAULT 0,
                   investigator_notes TEXT,
+                  claim_lo INTEGER,
+                  claim_hi INTEGER,
                   FOREIGN KEY (claim1_id) REFERENCES claims(id),
                   FOREIGN KEY (claim2_id) REFERENCES claims(id))''')
 
+    # Older databases predate the normalized claim pair columns
+    c.execute('PRAGMA table_info(contradictions)')
+    columns = {row['name'] for row in c.fetchall()}
+    if 'claim_lo' not in columns:
+        c.execute('ALTER TABLE contradictions ADD COLUMN claim_lo INTEGER')
+        c.execute('ALTER TABLE contradictions ADD COLUMN claim_hi INTEGER')
+        c.execute('''UPDATE contradictions
+                     SET claim_lo = MIN(claim1_id, claim2_id),
+                         claim_hi = MAX(claim1_id, claim2_id)''')
+
     # Claim entities - links claims to entities
     c.execute('''CREATE TABLE IF NOT EXISTS claim_entities
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -96,6 +108,15 @@ def init_contradiction_tables():
     c.execute('CREATE INDEX IF NOT EXISTS idx_claims_speaker ON claims(speaker)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_contradictions_claims ON contradictions(claim1_id, claim2_id)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_contradictions_severity ON contradictions(severity)')
+    # One row per unordered claim pair - lets INSERT OR IGNORE reject duplicates.
+    # Older databases can already hold repeats of a pair, which would fail the
+    # index, so the first row of each pair is kept before it is created
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_contradictions_pair'")
+    if c.fetchone() is None:
+        c.execute('''DELETE FROM contradictions
+                     WHERE rowid NOT IN (SELECT MIN(rowid) FROM contradictions
+                                         GROUP BY claim_lo, claim_hi)''')
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_contradictions_pair ON contradictions(claim_lo, claim_hi)')
 
     conn.commit()
     conn.close()
@@ -419,22 +440,14 @@ def save_contradiction(contradiction: Dict):
     conn = get_db()
     c = conn.cursor()
 
-    # Check if contradiction already exists (avoid duplicates)
-    c.execute('''SELECT id FROM contradictions
-                 WHERE (claim1_id = ? AND claim2_id = ?)
-                 OR (claim1_id = ? AND claim2_id = ?)''',
-              (contradiction['claim1_id'], contradiction['claim2_id'],
-               contradiction['claim2_id'], contradiction['claim1_id']))
-
-    if c.fetchone():
-        conn.close()
-        return  # Already exists
-
-    c.execute('''INSERT INTO contradictions
-                 (claim1_id, claim2_id, contradiction_type, severity, confidence_score,
-                  semantic_similarity, explanation, detected_date)
-                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-              (contradiction['claim1_id'], contradiction['claim2_id'],
+    # Normalize the pair so (a, b) and (b, a) hit the same unique index entry
+    claim_lo, claim_hi = sorted((contradiction['claim1_id'], contradiction['claim2_id']))
+
+    c.execute('''INSERT OR IGNORE INTO contradictions
+                 (claim1_id, claim2_id, claim_lo, claim_hi, contradiction_type, severity,
+                  confidence_score, semantic_similarity, explanation, detected_date)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+              (contradiction['claim1_id'], contradiction['claim2_id'], claim_lo, claim_hi,
                contradiction['type'], contradiction['severity'], contradiction['confidence'],
                contradiction['similarity'], contradiction['explanation'],
                datetime.now().isoformat()))
@@ -534,27 +547,30 @@ def get_contradiction_stats() -> Dict:
     conn = get_db()
     c = conn.cursor()
 
-    stats = {}
-
-    # Total contradictions
-    c.execute('SELECT COUNT(*) as total FROM contradictions')
-    stats['total_contradictions'] = c.fetchone()['total']
-
-    # By severity
-    c.execute('SELECT severity, COUNT(*) as count FROM contradictions GROUP BY severity')
-    stats['by_severity'] = {row['severity']: row['count'] for row in c.fetchall()}
-
-    # By type
-    c.execute('SELECT contradiction_type, COUNT(*) as count FROM contradictions GROUP BY contradiction_type')
-    stats['by_type'] = {row['contradiction_type']: row['count'] for row in c.fetchall()}
-
-    # Total claims
-    c.execute('SELECT COUNT(*) as total FROM claims')
-    stats['total_claims'] = c.fetchone()['total']
-
-    # High confidence contradictions
-    c.execute('SELECT COUNT(*) as total FROM contradictions WHERE confidence_score >= 0.8')
-    stats['high_confidence_contradictions'] = c.fetchone()['total']
+    stats = {'by_severity': {}, 'by_type': {}}
+
+    # Counts and breakdowns in one roundtrip, tagged by the stat they feed
+    c.execute('''SELECT 'total' as tag, NULL as label, COUNT(*) as count FROM contradictions
+                 UNION ALL
+                 SELECT 'high_confidence', NULL, COUNT(*) FROM contradictions WHERE confidence_score >= 0.8
+                 UNION ALL
+                 SELECT 'claims', NULL, COUNT(*) FROM claims
+                 UNION ALL
+                 SELECT 'severity', severity, COUNT(*) FROM contradictions GROUP BY severity
+                 UNION ALL
+                 SELECT 'type', contradiction_type, COUNT(*) FROM contradictions GROUP BY contradiction_type''')
+    for row in c.fetchall():
+        tag = row['tag']
+        if tag == 'total':
+            stats['total_contradictions'] = row['count']
+        elif tag == 'high_confidence':
+            stats['high_confidence_contradictions'] = row['count']
+        elif tag == 'claims':
+            stats['total_claims'] = row['count']
+        elif tag == 'severity':
+            stats['by_severity'][row['label']] = row['count']
+        else:
+            stats['by_type'][row['label']] = row['count']
 
     # Top speakers with contradictions
     c.execute('''SELECT cl.speaker, COUNT(DISTINCT c.id) as contradiction_count
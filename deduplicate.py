@@ -1,17 +1,89 @@
 #!/usr/bin/env python3
 """
 Deduplicate documents in the database
-Keeps the oldest copy of each duplicate file
+Documents are duplicates when their content matches; keeps the oldest copy
 """
 
 import sqlite3
 import os
+import hashlib
+from collections import defaultdict
+
+# The bulk deletes commit through WAL with relaxed fsync, and the hashing scan
+# over every document's content gets a 64 MiB page cache and 256 MiB of mmap
+DB_PRAGMAS = '''PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=NORMAL;
+                PRAGMA temp_store=MEMORY;
+                PRAGMA cache_size=-65536;
+                PRAGMA mmap_size=268435456;
+                PRAGMA busy_timeout=5000;'''
 
 def get_db():
     conn = sqlite3.connect('database.db')
+    conn.executescript(DB_PRAGMAS)
     conn.row_factory = sqlite3.Row
     return conn
 
+# Keep IN (...) lists well below SQLITE_MAX_VARIABLE_NUMBER (999 on older builds)
+DELETE_CHUNK_SIZE = 500
+
+def bulk_delete_in(c, table: str, column: str, ids: list, chunk: int = DELETE_CHUNK_SIZE) -> int:
+    """Delete rows whose column is in ids, a chunk at a time. Returns rows deleted"""
+    # Every batch is padded to the same width (repeating its last id is harmless
+    # inside IN) so the SQL text never changes and sqlite3's statement cache reuses
+    # one prepared statement
+    sql = f"DELETE FROM {table} WHERE {column} IN ({','.join('?' * chunk)})"
+
+    deleted = 0
+    for i in range(0, len(ids), chunk):
+        batch = ids[i:i + chunk]
+        batch += batch[-1:] * (chunk - len(batch))
+        c.execute(sql, batch)
+        deleted += c.rowcount
+    return deleted
+
+# Rows read and hashed per batch when refreshing content hashes
+HASH_BATCH_SIZE = 500
+
+def content_digest(content: str) -> bytes:
+    """128-bit BLAKE2b digest of document content - plenty for duplicate detection"""
+    return hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+def ensure_content_hashes(conn):
+    """Add the documents.content_hash column if needed and bring every hash up to date"""
+    c = conn.cursor()
+
+    c.execute('PRAGMA table_info(documents)')
+    if 'content_hash' not in {row['name'] for row in c.fetchall()}:
+        c.execute('ALTER TABLE documents ADD COLUMN content_hash BLOB')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents(content_hash)')
+
+    # Earlier versions cleared the hash from a trigger on every content update
+    # app-wide; stale hashes are now caught here instead
+    c.execute('DROP TRIGGER IF EXISTS documents_content_hash_reset')
+
+    # Content can be rewritten by other scripts (e.g. OCR) without touching the
+    # hash, so every document is rehashed and only changed hashes are written
+    last_id = 0
+    while True:
+        c.execute('''SELECT id, content, content_hash FROM documents
+                     WHERE content IS NOT NULL AND id > ?
+                     ORDER BY id LIMIT ?''', (last_id, HASH_BATCH_SIZE))
+        rows = c.fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for row in rows:
+            digest = content_digest(row['content'])
+            if digest != row['content_hash']:
+                updates.append((digest, row['id']))
+        c.executemany('UPDATE documents SET content_hash = ? WHERE id = ?', updates)
+        last_id = rows[-1]['id']
+
+    c.execute('UPDATE documents SET content_hash = NULL WHERE content IS NULL AND content_hash IS NOT NULL')
+    conn.commit()
+
 def deduplicate_documents():
     """Remove duplicate documents, keeping the oldest copy"""
     conn = get_db()
@@ -21,12 +93,16 @@ def deduplicate_documents():
     print("DOCUMENT DEDUPLICATION")
     print("=" * 60)
 
+    ensure_content_hashes(conn)
+
     # Get statistics before
     c.execute('SELECT COUNT(*) as total FROM documents')
     total_before = c.fetchone()['total']
 
-    c.execute('SELECT COUNT(DISTINCT filename) as unique_count FROM documents')
-    unique_files = c.fetchone()['unique_count']
+    # Documents without content can't be compared, so each counts as unique
+    c.execute('''SELECT COUNT(DISTINCT content_hash) + SUM(content_hash IS NULL) as unique_count
+                 FROM documents''')
+    unique_files = c.fetchone()['unique_count'] or 0
 
     duplicates_count = total_before - unique_files
 
@@ -35,16 +111,29 @@ def deduplicate_documents():
     print(f"  Unique files: {unique_files}")
     print(f"  Duplicates to remove: {duplicates_count}")
 
-    # Find duplicates
+    # Find duplicates - rank each copy within its content hash, oldest (lowest ID)
+    # first, and verify the content really matches the copy being kept
     c.execute('''
-        SELECT filename, COUNT(*) as count, GROUP_CONCAT(id) as ids
-        FROM documents
-        GROUP BY filename
-        HAVING count > 1
-        ORDER BY count DESC
+        WITH ranked AS (
+            SELECT id, filename, content_hash,
+                   ROW_NUMBER() OVER (PARTITION BY content_hash ORDER BY id) as rn,
+                   FIRST_VALUE(id) OVER (PARTITION BY content_hash ORDER BY id) as keep_id,
+                   COUNT(*) OVER (PARTITION BY content_hash) as count
+            FROM documents
+            WHERE content_hash IS NOT NULL
+        )
+        SELECT r.id, r.filename, r.content_hash
+        FROM ranked r
+        JOIN documents d ON d.id = r.id
+        JOIN documents k ON k.id = r.keep_id
+        WHERE r.count > 1 AND d.content = k.content
+        ORDER BY r.count DESC, r.content_hash, r.rn
     ''')
 
-    duplicates = c.fetchall()
+    groups = defaultdict(list)
+    for row in c:
+        groups[row['content_hash']].append((row['id'], row['filename']))
+    duplicates = [copies for copies in groups.values() if len(copies) > 1]
 
     if not duplicates:
         print("\n✓ No duplicates found!")
@@ -52,18 +141,16 @@ def deduplicate_documents():
         return
 
     print(f"\nDuplicate files found:")
-    for dup in duplicates:
-        print(f"  - {dup['filename']}: {dup['count']} copies")
+    for copies in duplicates:
+        print(f"  - {copies[0][1]}: {len(copies)} copies")
 
     # Remove duplicates (keep oldest - lowest ID)
     removed_ids = []
-    for dup in duplicates:
-        ids = [int(x) for x in dup['ids'].split(',')]
-        ids.sort()
-        keep_id = ids[0]  # Keep the oldest
-        remove_ids = ids[1:]  # Remove the rest
+    for copies in duplicates:
+        keep_id, keep_filename = copies[0]  # Keep the oldest
+        remove_ids = [doc_id for doc_id, _ in copies[1:]]  # Remove the rest
 
-        print(f"\n  {dup['filename']}:")
+        print(f"\n  {keep_filename}:")
         print(f"    Keeping ID: {keep_id}")
         print(f"    Removing IDs: {', '.join(map(str, remove_ids))}")
 
@@ -72,22 +159,19 @@ def deduplicate_documents():
     # Delete duplicate documents
     if removed_ids:
         print(f"\nRemoving {len(removed_ids)} duplicate documents...")
-        placeholders = ','.join('?' * len(removed_ids))
 
-        # Delete from entity_mentions first (foreign key)
-        c.execute(f'DELETE FROM entity_mentions WHERE doc_id IN ({placeholders})', removed_ids)
-        mentions_deleted = c.rowcount
-        print(f"  ✓ Deleted {mentions_deleted} entity mentions")
+        with conn:
+            # Delete from entity_mentions first (foreign key)
+            mentions_deleted = bulk_delete_in(c, 'entity_mentions', 'doc_id', removed_ids)
+            print(f"  ✓ Deleted {mentions_deleted} entity mentions")
 
-        # Delete from documents_fts
-        c.execute(f'DELETE FROM documents_fts WHERE doc_id IN ({placeholders})', removed_ids)
-        fts_deleted = c.rowcount
-        print(f"  ✓ Deleted {fts_deleted} FTS entries")
+            # Delete from documents_fts
+            fts_deleted = bulk_delete_in(c, 'documents_fts', 'doc_id', removed_ids)
+            print(f"  ✓ Deleted {fts_deleted} FTS entries")
 
-        # Delete from documents
-        c.execute(f'DELETE FROM documents WHERE id IN ({placeholders})', removed_ids)
-        docs_deleted = c.rowcount
-        print(f"  ✓ Deleted {docs_deleted} documents")
+            # Delete from documents
+            docs_deleted = bulk_delete_in(c, 'documents', 'id', removed_ids)
+            print(f"  ✓ Deleted {docs_deleted} documents")
 
         # Delete physical files
         print(f"\nDeleting physical files...")
@@ -96,8 +180,6 @@ def deduplicate_documents():
             # The files will just remain on disk (harmless)
             pass
 
-        conn.commit()
-
     # Get statistics after
     c.execute('SELECT COUNT(*) as total FROM documents')
     total_after = c.fetchone()['total']
@@ -110,6 +192,7 @@ def deduplicate_documents():
     print(f"Removed:          {total_before - total_after}")
     print(f"\n✓ Database deduplicated successfully!")
 
+    c.execute('PRAGMA optimize')
     conn.close()
 
 def clean_orphaned_entities():
@@ -135,9 +218,7 @@ def clean_orphaned_entities():
         orphaned_ids = [e['id'] for e in orphaned]
         print(f"Found {len(orphaned)} orphaned entities (no document references)")
 
-        placeholders = ','.join('?' * len(orphaned_ids))
-        c.execute(f'DELETE FROM entities WHERE id IN ({placeholders})', orphaned_ids)
-        deleted = c.rowcount
+        deleted = bulk_delete_in(c, 'entities', 'id', orphaned_ids)
 
         conn.commit()
         print(f"✓ Deleted {deleted} orphaned entities")
@@ -155,17 +236,32 @@ def rebuild_entity_counts():
     print("REBUILDING ENTITY COUNTS")
     print("=" * 60)
 
+    # Count every entity in one GROUP BY pass over the (entity_id, doc_id) index
+    # instead of a correlated COUNT(*) per entity row
+    c.execute('CREATE INDEX IF NOT EXISTS idx_em_entity_doc ON entity_mentions(entity_id, doc_id)')
+
     c.execute('''
         UPDATE entities
-        SET mention_count = (
-            SELECT COUNT(*)
+        SET mention_count = counts.mentions
+        FROM (
+            SELECT entity_id, COUNT(*) as mentions
             FROM entity_mentions
-            WHERE entity_id = entities.id
-        )
+            GROUP BY entity_id
+        ) as counts
+        WHERE counts.entity_id = entities.id
     ''')
-
     updated = c.rowcount
+
+    # Entities with no mentions left. NOT EXISTS rather than NOT IN, which
+    # matches nothing once any entity_mentions.entity_id is NULL
+    c.execute('''
+        UPDATE entities
+        SET mention_count = 0
+        WHERE NOT EXISTS (SELECT 1 FROM entity_mentions m WHERE m.entity_id = entities.id)
+    ''')
+    updated += c.rowcount
     conn.commit()
+    c.execute('PRAGMA optimize')
     conn.close()
 
     print(f"✓ Updated mention counts for {updated} entities")
@@ -5,12 +5,52 @@ Automatically links related documents and builds evidence chains
 
 import sqlite3
 import json
+import os
+import re
 from typing import List, Dict, Set, Tuple, Optional
-from collections import defaultdict, Counter
+from collections import defaultdict, deque, Counter
 from datetime import datetime
-
-def get_db():
-    conn = sqlite3.connect('database.db')
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy import sparse
+
+# Entities mentioned in more documents than this are too common to be useful
+# for generating candidate pairs (and would make candidate generation quadratic)
+MAX_POSTING_LENGTH = 500
+
+# Links must be stronger than this to be stored
+MIN_LINK_STRENGTH = 0.1
+
+# Names that boost a link when they appear in any shared entity (people names)
+IMPORTANT_ENTITIES = ['Epstein', 'Maxwell', 'Ghislaine', 'Jeffrey', 'Clinton', 'Trump', 'Andrew']
+IMPORTANT_ENTITIES_RE = re.compile('|'.join(map(re.escape, IMPORTANT_ENTITIES)))
+
+# Separates shared entity names in document_references.shared_entities
+ENTITY_SEPARATOR = '\x1f'
+
+# Candidate pairs per analysis batch, and the workload size at which batches are
+# spread across worker processes (below it the pool startup costs more than it saves)
+PAIR_BATCH_SIZE = 2000
+PARALLEL_MIN_PAIRS = 50000
+
+# Number of links written per executemany() call
+UPSERT_BATCH_SIZE = 1000
+
+# Connection tuning: WAL + relaxed fsync for writers, big page cache and mmap for everyone
+READ_PRAGMAS = '''PRAGMA temp_store=MEMORY;
+                  PRAGMA mmap_size=268435456;
+                  PRAGMA cache_size=-65536;
+                  PRAGMA busy_timeout=5000;'''
+WRITE_PRAGMAS = '''PRAGMA journal_mode=WAL;
+                   PRAGMA synchronous=NORMAL;'''
+
+def get_db(read_only: bool = False):
+    if read_only:
+        conn = sqlite3.connect('file:database.db?mode=ro', uri=True)
+    else:
+        conn = sqlite3.connect('database.db')
+        conn.executescript(WRITE_PRAGMAS)
+    conn.executescript(READ_PRAGMAS)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -47,6 +87,35 @@ def init_linking_tables():
     c.execute('CREATE INDEX IF NOT EXISTS idx_doc_refs_source ON document_references(source_doc_id)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_doc_refs_target ON document_references(target_doc_id)')
 
+    # Covering indexes so the link lookups and strength filters never touch the table rows
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_doc_refs_src_tgt_strength
+                 ON document_references(source_doc_id, target_doc_id, link_strength DESC)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_doc_refs_tgt_src_strength
+                 ON document_references(target_doc_id, source_doc_id, link_strength DESC)''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_em_doc_entity ON entity_mentions(doc_id, entity_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_em_entity_doc ON entity_mentions(entity_id, doc_id)')
+
+    # Full-text index over entity names, kept in sync with the entities table by
+    # the triggers; existing entities are only indexed when the table is created
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'entities_fts'")
+    fts_exists = c.fetchone() is not None
+    c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS entities_fts USING fts5(
+                  name,
+                  content='entities',
+                  content_rowid='id')''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS entities_fts_insert AFTER INSERT ON entities BEGIN
+                   INSERT INTO entities_fts(rowid, name) VALUES (new.id, new.name);
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS entities_fts_delete AFTER DELETE ON entities BEGIN
+                   INSERT INTO entities_fts(entities_fts, rowid, name) VALUES ('delete', old.id, old.name);
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS entities_fts_update AFTER UPDATE OF name ON entities BEGIN
+                   INSERT INTO entities_fts(entities_fts, rowid, name) VALUES ('delete', old.id, old.name);
+                   INSERT INTO entities_fts(rowid, name) VALUES (new.id, new.name);
+                 END''')
+    if not fts_exists:
+        c.execute("INSERT INTO entities_fts(entities_fts) VALUES ('rebuild')")
+
     conn.commit()
     conn.close()
 
@@ -59,7 +128,7 @@ def build_document_links() -> Dict:
     c = conn.cursor()
 
     # Get all documents with their entities
-    c.execute('''SELECT d.id, d.filename, d.content,
+    c.execute('''SELECT d.id, d.filename,
                         GROUP_CONCAT(e.name) as entities
                  FROM documents d
                  LEFT JOIN entity_mentions em ON d.id = em.doc_id
@@ -67,7 +136,7 @@ def build_document_links() -> Dict:
                  WHERE d.content IS NOT NULL
                  GROUP BY d.id''')
 
-    documents = [dict(row) for row in c.fetchall()]
+    documents = [prepare_document(row) for row in c.fetchall()]
     total_docs = len(documents)
 
     if total_docs < 2:
@@ -77,48 +146,78 @@ def build_document_links() -> Dict:
     links_created = 0
     links_updated = 0
 
-    # Compare each document pair
-    for i, doc1 in enumerate(documents):
-        for doc2 in documents[i+1:]:
-            link = analyze_document_pair(doc1, doc2)
-
-            if link and link['link_strength'] > 0.1:  # Minimum threshold
-                # Check if link already exists
-                c.execute('''SELECT id FROM document_references
-                             WHERE (source_doc_id = ? AND target_doc_id = ?)
-                             OR (source_doc_id = ? AND target_doc_id = ?)''',
-                          (doc1['id'], doc2['id'], doc2['id'], doc1['id']))
-
-                if c.fetchone():
-                    # Update existing
-                    c.execute('''UPDATE document_references
-                                 SET reference_type = ?,
-                                     shared_entities = ?,
-                                     link_strength = ?,
-                                     created_date = ?
-                                 WHERE (source_doc_id = ? AND target_doc_id = ?)
-                                 OR (source_doc_id = ? AND target_doc_id = ?)''',
-                              (link['reference_type'], link['shared_entities'],
-                               link['link_strength'], datetime.now().isoformat(),
-                               doc1['id'], doc2['id'], doc2['id'], doc1['id']))
+    # Document x entity incidence matrix, one column per distinct entity name
+    entity_columns = {}
+    doc_rows, entity_cols = [], []
+    for i, doc in enumerate(documents):
+        for entity in doc['entities']:
+            doc_rows.append(i)
+            entity_cols.append(entity_columns.setdefault(entity, len(entity_columns)))
+
+    incidence = sparse.csc_matrix((np.ones(len(doc_rows), dtype=np.int32), (doc_rows, entity_cols)),
+                                  shape=(total_docs, len(entity_columns)))
+    postings_length = np.asarray(incidence.sum(axis=0)).ravel()
+    incidence = incidence[:, postings_length <= MAX_POSTING_LENGTH].tocsr()
+
+    # Shared-entity counts for every pair at once; only pairs sharing at least
+    # one entity appear in the upper triangle
+    cooccurrence = sparse.triu(incidence @ incidence.T, k=1).tocoo()
+    candidates = defaultdict(set)
+    for i, j in zip(cooccurrence.row.tolist(), cooccurrence.col.tolist()):
+        candidates[i].add(j)
+
+    rows = []
+    # One timestamp for the whole rebuild rather than one per link
+    now = datetime.now().isoformat()
+
+    # The whole rebuild is one write transaction: no intermediate commits, and the
+    # WAL is still checkpointed in the background once it grows large
+    c.execute('PRAGMA wal_autocheckpoint=10000')
+    c.execute('BEGIN IMMEDIATE')
+    try:
+        # Existing links keyed by normalized pair -> stored (source, target) direction
+        existing_links = {}
+        for row in c.execute('SELECT source_doc_id, target_doc_id FROM document_references'):
+            pair = (row['source_doc_id'], row['target_doc_id'])
+            existing_links[tuple(sorted(pair))] = pair
+
+        # Analyze candidate pairs in batches (across worker processes for large
+        # corpora); all database writes stay in this process
+        pairs = [(i, j) for i in sorted(candidates) for j in sorted(candidates[i])]
+        batches = [pairs[k:k + PAIR_BATCH_SIZE] for k in range(0, len(pairs), PAIR_BATCH_SIZE)]
+
+        for batch_number, batch_links in enumerate(iter_pair_links(documents, batches), 1):
+            for i, j, link in batch_links:
+                # Reuse the stored direction so the UNIQUE(source, target)
+                # constraint catches the pair, otherwise store it normalized
+                pair = tuple(sorted((documents[i]['id'], documents[j]['id'])))
+                if pair in existing_links:
+                    source_id, target_id = existing_links[pair]
                     links_updated += 1
                 else:
-                    # Insert new
-                    c.execute('''INSERT INTO document_references
-                                 (source_doc_id, target_doc_id, reference_type,
-                                  shared_entities, link_strength, created_date)
-                                 VALUES (?, ?, ?, ?, ?, ?)''',
-                              (doc1['id'], doc2['id'], link['reference_type'],
-                               link['shared_entities'], link['link_strength'],
-                               datetime.now().isoformat()))
+                    source_id, target_id = existing_links[pair] = pair
                     links_created += 1
 
-        if (i + 1) % 10 == 0:
-            conn.commit()
-            print(f"Processed {i + 1}/{total_docs} documents...")
+                rows.append((source_id, target_id, link['reference_type'],
+                             link['shared_entities'], link['link_strength'], now))
 
-    conn.commit()
-    conn.close()
+                if len(rows) >= UPSERT_BATCH_SIZE:
+                    upsert_document_links(c, rows)
+                    rows = []
+
+            if batch_number % 10 == 0:
+                print(f"Processed {min(batch_number * PAIR_BATCH_SIZE, len(pairs))}/{len(pairs)} candidate pairs...")
+
+        upsert_document_links(c, rows)
+        conn.commit()
+
+        # Refresh planner statistics for the tables the rebuild touched
+        c.execute('PRAGMA optimize')
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
     return {
         'success': True,
@@ -128,16 +227,72 @@ def build_document_links() -> Dict:
         'total_links': links_created + links_updated
     }
 
-def analyze_document_pair(doc1: Dict, doc2: Dict) -> Optional[Dict]:
-    """Analyze two documents to determine if they should be linked"""
+def analyze_pair_batch(documents: List[Dict], batch: List[Tuple[int, int]]) -> List[Tuple[int, int, Dict]]:
+    """Analyze a batch of (index, index) document pairs, returning (i, j, link) for pairs worth linking"""
+    results = []
+    for i, j in batch:
+        link = analyze_document_pair(documents[i], documents[j], min_strength=MIN_LINK_STRENGTH)
+        if link:
+            results.append((i, j, link))
+    return results
+
+# Documents handed to each worker process once, rather than pickled with every batch
+_worker_documents = None
+
+def _init_pair_worker(documents: List[Dict]):
+    global _worker_documents
+    _worker_documents = documents
+
+def _analyze_pair_batch_in_worker(batch: List[Tuple[int, int]]) -> List[Tuple[int, int, Dict]]:
+    return analyze_pair_batch(_worker_documents, batch)
+
+def iter_pair_links(documents: List[Dict], batches: List[List[Tuple[int, int]]]):
+    """Yield analyze_pair_batch results in batch order, using a process pool for large workloads"""
+    if sum(len(batch) for batch in batches) < PARALLEL_MIN_PAIRS:
+        for batch in batches:
+            yield analyze_pair_batch(documents, batch)
+        return
+
+    with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=_init_pair_worker,
+                             initargs=(documents,)) as executor:
+        yield from executor.map(_analyze_pair_batch_in_worker, batches)
+
+def upsert_document_links(c, rows: List[Tuple]):
+    """Insert or refresh a batch of (source, target, type, shared, strength, date) links"""
+    c.executemany('''INSERT INTO document_references
+                     (source_doc_id, target_doc_id, reference_type,
+                      shared_entities, link_strength, created_date)
+                     VALUES (?, ?, ?, ?, ?, ?)
+                     ON CONFLICT(source_doc_id, target_doc_id) DO UPDATE SET
+                         reference_type = excluded.reference_type,
+                         shared_entities = excluded.shared_entities,
+                         link_strength = excluded.link_strength,
+                         created_date = excluded.created_date''', rows)
+
+def prepare_document(row) -> Dict:
+    """
+    Precompute the per-document features used when comparing pairs, so they are
+    derived once per document rather than once per pair
+    """
+    filename = row['filename']
+    entities = row['entities'].split(',') if row['entities'] else []
 
-    # Parse entities
-    entities1 = set(doc1['entities'].split(',')) if doc1['entities'] else set()
-    entities2 = set(doc2['entities'].split(',')) if doc2['entities'] else set()
+    return {
+        'id': row['id'],
+        'filename': filename,
+        'filename_lower': filename.lower(),
+        'extension': filename.rsplit('.', 1)[-1],
+        'entities': frozenset(e for e in entities if e.strip())  # Remove empty
+    }
+
+def analyze_document_pair(doc1: Dict, doc2: Dict, min_strength: float = 0.0) -> Optional[Dict]:
+    """
+    Analyze two documents (as built by prepare_document) to determine if they should be linked.
+    Pairs whose link strength does not exceed min_strength are rejected before any further work
+    """
 
     # Find shared entities
-    shared_entities = entities1 & entities2
-    shared_entities = {e for e in shared_entities if e.strip()}  # Remove empty
+    shared_entities = doc1['entities'] & doc2['entities']
 
     if not shared_entities:
         return None
@@ -145,15 +300,34 @@ def analyze_document_pair(doc1: Dict, doc2: Dict) -> Optional[Dict]:
     # Calculate link strength based on shared entities and other factors
     link_strength = calculate_link_strength(doc1, doc2, shared_entities)
 
+    # Most candidate pairs share a single ordinary entity and fall below the threshold
+    if link_strength <= min_strength:
+        return None
+
     # Determine reference type
     reference_type = determine_reference_type(doc1, doc2, shared_entities)
 
     return {
         'reference_type': reference_type,
-        'shared_entities': json.dumps(list(shared_entities)),
+        'shared_entities': encode_shared_entities(shared_entities),
         'link_strength': link_strength
     }
 
+def encode_shared_entities(shared_entities: Set[str]) -> str:
+    """Serialize shared entity names for storage, separated by the ASCII unit separator"""
+    return ENTITY_SEPARATOR.join(sorted(shared_entities))
+
+def decode_shared_entities(value: Optional[str]) -> List[str]:
+    """Parse a stored shared_entities value (links written before the switch hold JSON)"""
+    if not value:
+        return []
+    if value.startswith('[') and ENTITY_SEPARATOR not in value:
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value.split(ENTITY_SEPARATOR)
+
 def calculate_link_strength(doc1: Dict, doc2: Dict, shared_entities: Set[str]) -> float:
     """Calculate strength of link between two documents"""
 
@@ -163,12 +337,11 @@ def calculate_link_strength(doc1: Dict, doc2: Dict, shared_entities: Set[str]) -
     strength += min(len(shared_entities) * 0.1, 0.5)
 
     # Boost for important entities (people names)
-    important_entities = {'Epstein', 'Maxwell', 'Ghislaine', 'Jeffrey', 'Clinton', 'Trump', 'Andrew'}
-    if any(name in ' '.join(shared_entities) for name in important_entities):
+    if IMPORTANT_ENTITIES_RE.search(' '.join(shared_entities)):
         strength += 0.2
 
     # Boost for same document type
-    if doc1['filename'].split('.')[-1] == doc2['filename'].split('.')[-1]:
+    if doc1['extension'] == doc2['extension']:
         strength += 0.1
 
     # Boost for date proximity (if dates in filenames)
@@ -179,8 +352,8 @@ def calculate_link_strength(doc1: Dict, doc2: Dict, shared_entities: Set[str]) -
 def determine_reference_type(doc1: Dict, doc2: Dict, shared_entities: Set[str]) -> str:
     """Determine the type of reference between documents"""
 
-    filename1_lower = doc1['filename'].lower()
-    filename2_lower = doc2['filename'].lower()
+    filename1_lower = doc1['filename_lower']
+    filename2_lower = doc2['filename_lower']
 
     # Deposition cross-references
     if 'deposition' in filename1_lower and 'deposition' in filename2_lower:
@@ -208,37 +381,35 @@ def determine_reference_type(doc1: Dict, doc2: Dict, shared_entities: Set[str])
 
 def get_related_documents(doc_id: int, min_strength: float = 0.2, limit: int = 20) -> List[Dict]:
     """Get documents related to a specific document"""
-    conn = get_db()
+    conn = get_db(read_only=True)
     c = conn.cursor()
 
-    c.execute('''SELECT
-                    CASE
-                        WHEN dr.source_doc_id = ? THEN dr.target_doc_id
-                        ELSE dr.source_doc_id
-                    END as related_doc_id,
-                    dr.reference_type,
-                    dr.shared_entities,
-                    dr.link_strength,
-                    d.filename,
-                    d.file_type,
-                    d.uploaded_date
-                 FROM document_references dr
-                 JOIN documents d ON (
-                    CASE
-                        WHEN dr.source_doc_id = ? THEN dr.target_doc_id
-                        ELSE dr.source_doc_id
-                    END = d.id
-                 )
-                 WHERE (dr.source_doc_id = ? OR dr.target_doc_id = ?)
-                 AND dr.link_strength >= ?
-                 ORDER BY dr.link_strength DESC
+    # One indexed lookup per link direction instead of an OR across both columns
+    c.execute('''SELECT r.related_doc_id,
+                        r.reference_type,
+                        r.shared_entities,
+                        r.link_strength,
+                        d.filename,
+                        d.file_type,
+                        d.uploaded_date
+                 FROM (SELECT target_doc_id as related_doc_id, reference_type,
+                              shared_entities, link_strength
+                       FROM document_references
+                       WHERE source_doc_id = ? AND link_strength >= ?
+                       UNION ALL
+                       SELECT source_doc_id, reference_type,
+                              shared_entities, link_strength
+                       FROM document_references
+                       WHERE target_doc_id = ? AND link_strength >= ?) r
+                 JOIN documents d ON d.id = r.related_doc_id
+                 ORDER BY r.link_strength DESC
                  LIMIT ?''',
-              (doc_id, doc_id, doc_id, doc_id, min_strength, limit))
+              (doc_id, min_strength, doc_id, min_strength, limit))
 
     results = []
     for row in c.fetchall():
         result = dict(row)
-        result['shared_entities'] = json.loads(result['shared_entities']) if result['shared_entities'] else []
+        result['shared_entities'] = decode_shared_entities(result['shared_entities'])
         results.append(result)
 
     conn.close()
@@ -249,15 +420,35 @@ def build_evidence_chain(start_doc_id: int, target_entity: str, max_depth: int =
     Build an evidence chain from a starting document through related documents
     that all mention a target entity
     """
-    conn = get_db()
+    conn = get_db(read_only=True)
     c = conn.cursor()
 
+    # Prefetch every document's entities and the link graph so the walk below
+    # needs no per-node queries
+    c.execute('''SELECT d.id, d.filename, GROUP_CONCAT(e.name) as entities
+                 FROM documents d
+                 LEFT JOIN entity_mentions em ON d.id = em.doc_id
+                 LEFT JOIN entities e ON em.entity_id = e.id
+                 GROUP BY d.id''')
+    documents = {row['id']: (row['filename'], row['entities'].split(',') if row['entities'] else [])
+                 for row in c.fetchall()}
+
+    c.execute('''SELECT source_doc_id, target_doc_id, link_strength
+                 FROM document_references
+                 WHERE link_strength >= 0.3''')
+    adjacency = defaultdict(list)
+    for row in c.fetchall():
+        adjacency[row['source_doc_id']].append((row['link_strength'], row['target_doc_id']))
+        adjacency[row['target_doc_id']].append((row['link_strength'], row['source_doc_id']))
+
+    conn.close()
+
     visited = set()
     chain = []
-    queue = [(start_doc_id, 0, [])]  # (doc_id, depth, path)
+    queue = deque([(start_doc_id, 0, [])])  # (doc_id, depth, path)
 
     while queue:
-        current_doc, depth, path = queue.pop(0)
+        current_doc, depth, path = queue.popleft()
 
         if current_doc in visited or depth >= max_depth:
             continue
@@ -265,37 +456,28 @@ def build_evidence_chain(start_doc_id: int, target_entity: str, max_depth: int =
         visited.add(current_doc)
 
         # Check if this document mentions the target entity
-        c.execute('''SELECT d.*, GROUP_CONCAT(e.name) as entities
-                     FROM documents d
-                     LEFT JOIN entity_mentions em ON d.id = em.doc_id
-                     LEFT JOIN entities e ON em.entity_id = e.id
-                     WHERE d.id = ?
-                     GROUP BY d.id''', (current_doc,))
-
-        doc = c.fetchone()
-        if not doc:
+        if current_doc not in documents:
             continue
 
-        entities = doc['entities'].split(',') if doc['entities'] else []
+        filename, entities = documents[current_doc]
 
         if target_entity in ' '.join(entities):
             current_path = path + [{
-                'doc_id': doc['id'],
-                'filename': doc['filename'],
+                'doc_id': current_doc,
+                'filename': filename,
                 'depth': depth,
                 'entities': entities
             }]
 
             chain.append(current_path)
 
-            # Get related documents
-            related = get_related_documents(current_doc, min_strength=0.3, limit=10)
-
-            for rel in related:
-                if rel['related_doc_id'] not in visited:
-                    queue.append((rel['related_doc_id'], depth + 1, current_path))
+            # Follow the 10 strongest links to documents that still exist
+            related = sorted((link for link in adjacency[current_doc] if link[1] in documents),
+                             key=lambda link: link[0], reverse=True)[:10]
 
-    conn.close()
+            for _, related_doc_id in related:
+                if related_doc_id not in visited:
+                    queue.append((related_doc_id, depth + 1, current_path))
 
     # Sort chains by length (longer chains = more corroboration)
     chain.sort(key=lambda x: len(x), reverse=True)
@@ -307,15 +489,27 @@ def get_citation_network(entity_name: str) -> Dict:
     Get a network of documents that cite/reference each other
     related to a specific entity
     """
-    conn = get_db()
+    conn = get_db(read_only=True)
     c = conn.cursor()
 
-    # Get all documents mentioning the entity
-    c.execute('''SELECT DISTINCT d.id, d.filename
-                 FROM documents d
-                 JOIN entity_mentions em ON d.id = em.doc_id
-                 JOIN entities e ON em.entity_id = e.id
-                 WHERE e.name LIKE ?''', (f'%{entity_name}%',))
+    # Get all documents mentioning the entity - every word of the query as a
+    # prefix match against the entity name index
+    tokens = re.findall(r'\w+', entity_name)
+    fts_query = ' '.join(f'"{token}"*' for token in tokens)
+
+    try:
+        c.execute('''SELECT DISTINCT d.id, d.filename
+                     FROM entities_fts ef
+                     JOIN entity_mentions em ON em.entity_id = ef.rowid
+                     JOIN documents d ON d.id = em.doc_id
+                     WHERE entities_fts MATCH ?''', (fts_query,))
+    except sqlite3.OperationalError:
+        # Entity index not built yet (init_linking_tables not run) or empty query
+        c.execute('''SELECT DISTINCT d.id, d.filename
+                     FROM documents d
+                     JOIN entity_mentions em ON d.id = em.doc_id
+                     JOIN entities e ON em.entity_id = e.id
+                     WHERE e.name LIKE ?''', (f'%{entity_name}%',))
 
     docs = [dict(row) for row in c.fetchall()]
     doc_ids = [d['id'] for d in docs]
@@ -355,7 +549,7 @@ def get_citation_network(entity_name: str) -> Dict:
 
 def get_linking_stats() -> Dict:
     """Get statistics about document linking"""
-    conn = get_db()
+    conn = get_db(read_only=True)
     c = conn.cursor()
 
     stats = {}
@@ -4,10 +4,13 @@ Enhanced Epstein Document Downloader
 Downloads from FBI, DOJ, court archives, and other legitimate sources
 """
 
-import requests
+import aiohttp
+import asyncio
 import os
 import time
+from collections import defaultdict
 from pathlib import Path
+from urllib.parse import urlparse
 
 DOWNLOAD_SOURCES = [
     {
@@ -52,7 +55,19 @@ DOWNLOAD_SOURCES = [
     }
 ]
 
-def download_file(url, filename, download_dir):
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+}
+
+# Downloads in flight at once, and pause between requests to the same host
+MAX_CONCURRENT_DOWNLOADS = 4
+SAME_HOST_DELAY = 2
+
+# Read/write granularity and minimum seconds between progress updates
+CHUNK_SIZE = 1 << 20
+PROGRESS_INTERVAL = 0.25
+
+async def download_file(session, url, filename, download_dir):
     """Download a file with progress indication"""
     filepath = download_dir / filename
 
@@ -65,28 +80,27 @@ def download_file(url, filename, download_dir):
     print(f"  URL: {url}")
 
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        }
-        response = requests.get(url, stream=True, timeout=60, headers=headers, allow_redirects=True)
-        response.raise_for_status()
-
-        total_size = int(response.headers.get('content-length', 0))
-
-        with open(filepath, 'wb') as f:
-            if total_size == 0:
-                f.write(response.content)
-                print(f"  ✓ Downloaded: {filename}")
-            else:
+        async with session.get(url, allow_redirects=True) as response:
+            response.raise_for_status()
+
+            total_size = response.content_length or 0
+
+            with open(filepath, 'wb', buffering=CHUNK_SIZE) as f:
                 downloaded = 0
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
+                last_print = 0.0
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    # Keep disk writes off the event loop so other downloads keep flowing
+                    await asyncio.to_thread(f.write, chunk)
+                    downloaded += len(chunk)
+
+                    # Printing every chunk costs more than the write on a fast link
+                    now = time.monotonic()
+                    if total_size and now - last_print >= PROGRESS_INTERVAL:
                         percent = (downloaded / total_size) * 100
-                        print(f"    Progress: {percent:.1f}%", end='\r')
+                        print(f"    Progress ({filename}): {percent:.1f}%", end='\r')
+                        last_print = now
 
-                print(f"\n  ✓ Downloaded: {filename} ({total_size / 1024 / 1024:.1f} MB)")
+            print(f"\n  ✓ Downloaded: {filename} ({downloaded / 1024 / 1024:.1f} MB)")
 
         return filepath
 
@@ -96,6 +110,33 @@ def download_file(url, filename, download_dir):
             filepath.unlink()  # Delete partial file
         return None
 
+async def download_host_sources(session, semaphore, sources, download_dir, results):
+    """Download one host's sources in order, pausing between requests to that host"""
+    for i, (index, source) in enumerate(sources):
+        if i > 0:
+            # Be respectful with requests
+            await asyncio.sleep(SAME_HOST_DELAY)
+
+        async with semaphore:
+            print(f"\n[{index}/{len(DOWNLOAD_SOURCES)}] SOURCE: {source['name']}")
+            results[index] = await download_file(session, source['url'], source['filename'], download_dir)
+
+async def download_all(download_dir):
+    """Download every source concurrently, one queue per host. Returns results in source order"""
+    by_host = defaultdict(list)
+    for index, source in enumerate(DOWNLOAD_SOURCES, 1):
+        by_host[urlparse(source['url']).netloc].append((index, source))
+
+    results = {}
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=60, sock_read=60)
+
+    async with aiohttp.ClientSession(headers=HEADERS, timeout=timeout) as session:
+        await asyncio.gather(*(download_host_sources(session, semaphore, sources, download_dir, results)
+                               for sources in by_host.values()))
+
+    return [results[index] for index in range(1, len(DOWNLOAD_SOURCES) + 1)]
+
 def main():
     """Main download orchestration"""
     print("=" * 70)
@@ -113,21 +154,12 @@ def main():
     downloaded_files = []
     failed_downloads = []
 
-    for i, source in enumerate(DOWNLOAD_SOURCES, 1):
-        print(f"\n[{i}/{len(DOWNLOAD_SOURCES)}] " + "=" * 60)
-        print(f"SOURCE: {source['name']}")
-        print("=" * 70)
-
-        result = download_file(source['url'], source['filename'], download_dir)
-
+    for source, result in zip(DOWNLOAD_SOURCES, asyncio.run(download_all(download_dir))):
         if result:
             downloaded_files.append(result)
         else:
             failed_downloads.append(source['name'])
 
-        # Be respectful with requests
-        time.sleep(2)
-
     # Summary
     print("\n" + "=" * 70)
     print("DOWNLOAD SUMMARY")
@@ -4,9 +4,13 @@ Epstein Document Downloader
 Downloads and imports Epstein documents from legitimate public sources
 """
 
-import requests
+import aiohttp
+import asyncio
+import fcntl
+import mmap
 import os
-import time
+import re
+import struct
 from pathlib import Path
 
 # Document sources from epstein_sources.json
@@ -81,49 +85,251 @@ PERSONS_OF_INTEREST = [
     "Stephen Hawking"
 ]
 
+# Every name as one case-insensitive alternation, so a document is scanned in a
+# single pass. Longest names first so a longer variant wins where two overlap.
+# The bytes twin runs straight over an mmap'd file without decoding it
+_POI_ALTERNATION = '|'.join(sorted(map(re.escape, PERSONS_OF_INTEREST), key=len, reverse=True))
+POI_PATTERN = re.compile(rf'\b(?:{_POI_ALTERNATION})\b', re.IGNORECASE)
+POI_BYTES_PATTERN = re.compile(rf'\b(?:{_POI_ALTERNATION})\b'.encode('ascii'), re.IGNORECASE)
+POI_BY_LOWER = {person.lower(): person for person in PERSONS_OF_INTEREST}
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+}
+
+# Connection pool limits (total / per host), and how long an idle pooled
+# connection stays open for the next request to reuse
+CONNECTION_LIMIT = 32
+CONNECTION_LIMIT_PER_HOST = 4
+KEEPALIVE_TIMEOUT = 60
+
+# Retries per file after the first attempt, base of the exponential backoff
+# (seconds), and the HTTP statuses worth retrying
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Read/write granularity and bytes between progress updates
+CHUNK_SIZE = 1 << 20
+PROGRESS_EVERY = 10 * 1024 * 1024
+
+# Large files are fetched as this many concurrent byte ranges; smaller ones
+# aren't worth the extra requests
+RANGE_PARTS = 8
+RANGE_MIN_SIZE = 16 * 1024 * 1024
+
+# Files at least this big get their disk space reserved before the first write
+PREALLOCATE_MIN_SIZE = 16 * 1024 * 1024
+
+def release_page_cache(fd):
+    """Tell the kernel a freshly written file won't be re-read soon"""
+    # posix_fadvise doesn't exist on macOS, where the cache is left alone
+    if hasattr(os, 'posix_fadvise'):
+        # DONTNEED only drops pages that have already been written back
+        os.fdatasync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+async def run_to_completion(func, *args):
+    """Run func on a worker thread; if the caller is cancelled, wait for the thread
+    to finish before re-raising, since cancelling the future doesn't stop it"""
+    future = asyncio.get_running_loop().run_in_executor(None, func, *args)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await future
+        raise
+
+def preallocate(fd, size):
+    """Reserve size bytes for fd up front so the file isn't extended one write at a time"""
+    try:
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(fd, 0, size)
+        elif hasattr(fcntl, 'F_PREALLOCATE'):
+            # macOS: fstore_t {flags, posmode, offset, length, bytesalloc}
+            fcntl.fcntl(fd, fcntl.F_PREALLOCATE,
+                        struct.pack('Iiqqq', fcntl.F_ALLOCATECONTIG, fcntl.F_PEOFPOSMODE, 0, size, 0))
+    except OSError:
+        pass  # Best effort - not every filesystem supports it
+
+async def ranged_download(session, url, partial, name, parts=RANGE_PARTS):
+    """Fetch url as parallel byte ranges written in place into partial.
+
+    Returns False, leaving nothing on disk, when the server doesn't serve
+    ranges or the file is too small to bother; the caller then falls back to
+    a plain GET.
+    """
+    async with session.head(url, allow_redirects=True) as head:
+        if head.status != 200 or head.headers.get('Accept-Ranges') != 'bytes':
+            return False
+        total = head.content_length or 0
+        url = head.url  # Skip the redirect chain on every range request
+
+    if total < RANGE_MIN_SIZE:
+        return False
+
+    # Some servers advertise ranges but answer a Range request with the whole body
+    async with session.get(url, headers={'Range': 'bytes=0-0'}) as probe:
+        if probe.status != 206:
+            return False
+
+    ranges = [(i * total // parts, (i + 1) * total // parts - 1) for i in range(parts)]
+    downloaded = 0
+    last_print = 0
+
+    async def fetch_range(start, end):
+        nonlocal downloaded, last_print
+        async with session.get(url, headers={'Range': f'bytes={start}-{end}'}) as response:
+            if response.status != 206:
+                raise IOError(f"HTTP {response.status} for bytes {start}-{end}")
+
+            offset = start
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                await run_to_completion(os.pwrite, fd, chunk, offset)
+                offset += len(chunk)
+                downloaded += len(chunk)
+                if downloaded - last_print >= PROGRESS_EVERY:
+                    last_print = downloaded
+                    print(f"    Progress ({name}): {downloaded / total * 100:.1f}%", end='\r')
+
+            if offset != end + 1:
+                raise IOError(f"Range {start}-{end} ended early at byte {offset}")
+
+    fd = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        preallocate(fd, total)
+        os.ftruncate(fd, total)
+        # A failed range cancels its siblings, and the TaskGroup only exits once
+        # each has returned - after any write it had handed to a thread - so
+        # nothing is still using the descriptor when it is closed
+        async with asyncio.TaskGroup() as tg:
+            for start, end in ranges:
+                tg.create_task(fetch_range(start, end))
+        await run_to_completion(release_page_cache, fd)
+    except BaseException as e:
+        partial.unlink()  # Delete partial file
+        if isinstance(e, ExceptionGroup):
+            raise e.exceptions[0]
+        raise
+    finally:
+        os.close(fd)
+
+    return True
+
+def partial_path(filepath):
+    """Where filepath's bytes land until the download is complete"""
+    return filepath.with_name(filepath.name + '.part')
+
+async def fetch_file(session, url, filepath):
+    """Stream url to filepath, as byte ranges when the server allows.
+
+    Bytes land in a .part file that only replaces filepath once complete, so
+    an interrupted run never leaves a file the next one takes as downloaded.
+    """
+    partial = partial_path(filepath)
+    if await ranged_download(session, url, partial, filepath.name):
+        os.replace(partial, filepath)
+        return
+
+    async with session.get(url) as response:
+        response.raise_for_status()
+
+        total_size = response.content_length or 0
+
+        with open(partial, 'wb', buffering=CHUNK_SIZE) as f:
+            if total_size == 0:
+                f.write(await response.read())
+            else:
+                if total_size >= PREALLOCATE_MIN_SIZE:
+                    preallocate(f.fileno(), total_size)
+
+                downloaded = 0
+                last_print = 0
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    # Keep disk writes off the event loop so other downloads keep flowing
+                    await asyncio.to_thread(f.write, chunk)
+                    downloaded += len(chunk)
+
+                    # Printing every chunk costs more than the write on a fast link
+                    if downloaded - last_print >= PROGRESS_EVERY:
+                        last_print = downloaded
+                        percent = (downloaded / total_size) * 100
+                        print(f"    Progress ({filepath.name}): {percent:.1f}%", end='\r')
+
+                # Drop any preallocated space the body didn't fill
+                f.truncate()
+                if downloaded < total_size:
+                    raise IOError(f"connection closed at {downloaded:,} of {total_size:,} bytes")
+
+            f.flush()
+            await asyncio.to_thread(release_page_cache, f.fileno())
+
+    os.replace(partial, filepath)
+
+def is_retryable(error):
+    """Transient network failures and throttling/5xx responses are worth another try"""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRY_STATUSES
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError, OSError))
+
+async def remote_size(session, url):
+    """Content-Length of url from a HEAD request, or None"""
+    try:
+        async with session.head(url, allow_redirects=True) as response:
+            if response.status == 200:
+                return response.content_length
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        pass
+    return None
+
 def create_download_directory():
     """Create directory for downloads"""
     download_dir = Path("epstein_downloads")
     download_dir.mkdir(exist_ok=True)
     return download_dir
 
-def download_file(url, filename, download_dir):
-    """Download a file with progress indication"""
+async def download_file(session, url, filename, download_dir, mirror_of=None):
+    """Download a file with progress indication.
+
+    mirror_of names an already downloaded copy of the same document; when url
+    reports the same size the copy is hard-linked instead of downloaded again.
+    """
     filepath = download_dir / filename
 
     if filepath.exists():
         print(f"  ✓ Already exists: {filename}")
         return filepath
 
+    if mirror_of and await remote_size(session, url) == mirror_of.stat().st_size:
+        try:
+            os.link(mirror_of, filepath)
+            print(f"  🔗 Same size as {mirror_of.name} - linked instead of downloading: {filename}")
+            return filepath
+        except OSError:
+            pass
+
     print(f"  Downloading: {filename}")
     print(f"  URL: {url}")
 
-    try:
-        response = requests.get(url, stream=True, timeout=30)
-        response.raise_for_status()
-
-        total_size = int(response.headers.get('content-length', 0))
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            await fetch_file(session, url, filepath)
 
-        with open(filepath, 'wb') as f:
-            if total_size == 0:
-                f.write(response.content)
-            else:
-                downloaded = 0
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        percent = (downloaded / total_size) * 100
-                        print(f"    Progress: {percent:.1f}%", end='\r')
+            size_mb = filepath.stat().st_size / 1024 / 1024
+            print(f"\n  ✓ Downloaded: {filename} ({size_mb:.1f} MB)")
+            return filepath
 
-        print(f"\n  ✓ Downloaded: {filename} ({total_size / 1024 / 1024:.1f} MB)")
-        return filepath
+        except Exception as e:
+            if attempt < MAX_RETRIES and is_retryable(e):
+                delay = RETRY_BACKOFF * 2 ** attempt
+                print(f"  ⚠️  {filename}: {e} - retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
 
-    except Exception as e:
-        print(f"  ✗ Error downloading {filename}: {e}")
-        return None
+            print(f"  ✗ Error downloading {filename}: {e}")
+            partial_path(filepath).unlink(missing_ok=True)  # Delete partial file
+            return None
 
-def download_guardian_943_pages(download_dir):
+async def download_guardian_943_pages(session, download_dir):
     """Download the Guardian 943-page PDF"""
     print("\n" + "="*60)
     print("DOWNLOADING: Guardian 943-Page Unsealed Documents")
@@ -132,10 +338,10 @@ def download_guardian_943_pages(download_dir):
     url = "https://uploads.guim.co.uk/2024/01/04/Final_Epstein_documents.pdf"
     filename = "Final_Epstein_documents.pdf"
 
-    return download_file(url, filename, download_dir)
+    return await download_file(session, url, filename, download_dir)
 
-def download_internet_archive_backup(download_dir):
-    """Download Internet Archive backup"""
+async def download_internet_archive_backup(session, download_dir, guardian_file=None):
+    """Download Internet Archive backup, unless it's the Guardian file we already have"""
     print("\n" + "="*60)
     print("DOWNLOADING: Internet Archive Backup")
     print("="*60)
@@ -143,7 +349,7 @@ def download_internet_archive_backup(download_dir):
     url = "https://archive.org/download/final-epstein-documents/final-epstein-documents.pdf"
     filename = "IA_final-epstein-documents.pdf"
 
-    return download_file(url, filename, download_dir)
+    return await download_file(session, url, filename, download_dir, mirror_of=guardian_file)
 
 def generate_download_instructions():
     """Generate instructions for manual downloads"""
@@ -167,14 +373,24 @@ def generate_download_instructions():
     print("   → Download individual documents (flight logs, contact book, etc.)")
     print("   → Save to: epstein_downloads/")
 
-def scan_for_persons_of_interest(text, filename):
-    """Scan document text for persons of interest"""
-    found_people = []
-    text_lower = text.lower()
+def scan_for_persons_of_interest(source, filename):
+    """Scan document text, or a file path / mmap of its bytes, for persons of interest"""
+    if isinstance(source, str):
+        matched = {POI_BY_LOWER[name.lower()] for name in POI_PATTERN.findall(source)}
+    elif isinstance(source, os.PathLike):
+        # Map the file rather than reading it so big PDFs are paged in on demand
+        with open(source, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                matched = set()
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    matched = {POI_BY_LOWER[name.decode('ascii').lower()]
+                               for name in POI_BYTES_PATTERN.findall(mm)}
+    else:
+        matched = {POI_BY_LOWER[name.decode('ascii').lower()]
+                   for name in POI_BYTES_PATTERN.findall(source)}
 
-    for person in PERSONS_OF_INTEREST:
-        if person.lower() in text_lower:
-            found_people.append(person)
+    found_people = [person for person in PERSONS_OF_INTEREST if person in matched]
 
     if found_people:
         print(f"\n  🎯 Found in {filename}:")
@@ -183,6 +399,20 @@ def scan_for_persons_of_interest(text, filename):
 
     return found_people
 
+async def download_direct_pdfs(download_dir):
+    """Fetch the direct-download PDFs over one session"""
+    connector = aiohttp.TCPConnector(limit=CONNECTION_LIMIT, limit_per_host=CONNECTION_LIMIT_PER_HOST,
+                                     keepalive_timeout=KEEPALIVE_TIMEOUT)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30)
+
+    async with aiohttp.ClientSession(connector=connector, headers=HEADERS, timeout=timeout) as session:
+        # The Internet Archive copy is a mirror of the Guardian PDF, so it is only
+        # transferred if the Guardian download failed or the sizes differ
+        guardian_file = await download_guardian_943_pages(session, download_dir)
+        backup_file = await download_internet_archive_backup(session, download_dir, guardian_file)
+
+    return [f for f in (guardian_file, backup_file) if f]
+
 def main():
     """Main download orchestration"""
     print("="*60)
@@ -209,19 +439,7 @@ def main():
     print(f"\n✓ Download directory: {download_dir.absolute()}")
 
     # Download direct PDFs
-    downloaded_files = []
-
-    # Guardian 943 pages
-    file1 = download_guardian_943_pages(download_dir)
-    if file1:
-        downloaded_files.append(file1)
-
-    time.sleep(2)  # Be respectful with requests
-
-    # Internet Archive backup
-    file2 = download_internet_archive_backup(download_dir)
-    if file2:
-        downloaded_files.append(file2)
+    downloaded_files = asyncio.run(download_direct_pdfs(download_dir))
 
     # Generate manual download instructions
     generate_download_instructions()
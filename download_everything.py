@@ -4,10 +4,17 @@ Download EVERYTHING from every source in the JSON
 NO EXCUSES - GET IT ALL
 """
 
-import requests
+import aiohttp
+import asyncio
 import os
+import shutil
 import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from pathlib import Path
+from urllib.parse import urlparse
 import zipfile
 
 DOWNLOAD_DIR = "/Users/jonathon/Downloads/EpsteinDocs"
@@ -39,7 +46,9 @@ DOWNLOADS = [
     {
         "name": "Guardian Original PDF",
         "url": "https://uploads.guim.co.uk/2024/01/04/Final_Epstein_documents.pdf",
-        "file": "Guardian_Final_Epstein_Documents.pdf"
+        "file": "Guardian_Final_Epstein_Documents.pdf",
+        # Same document as the Internet Archive's final-epstein-documents.pdf
+        "mirror_of": "InternetArchive_Final_Documents.pdf"
     },
     # DocumentCloud
     {
@@ -55,7 +64,70 @@ DOWNLOADS = [
     },
 ]
 
-def download_with_progress(url, filepath, name):
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+}
+
+# Downloads in flight at once, and connection pool limits (total / per host)
+MAX_CONCURRENT_DOWNLOADS = 8
+CONNECTION_LIMIT = 32
+CONNECTION_LIMIT_PER_HOST = 4
+
+# Retries after the first attempt, base of the exponential backoff (seconds),
+# and the HTTP statuses worth retrying; a Retry-After header overrides the backoff
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1.5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Disk writes go to a small pool shared by every download, so receiving the next
+# chunk overlaps with writing the last one. Set OFFLOAD_DISK_WRITES = False to
+# write on the event loop instead - worth benchmarking on fast NVMe, where the
+# thread hand-off can cost more than the write
+OFFLOAD_DISK_WRITES = True
+DISK_WRITER_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix='disk-writer')
+
+async def write_chunk(f, chunk):
+    """Write chunk to f on the disk writer pool (or inline when offloading is off)"""
+    if OFFLOAD_DISK_WRITES:
+        await asyncio.get_running_loop().run_in_executor(DISK_WRITER_POOL, f.write, chunk)
+    else:
+        f.write(chunk)
+
+# Politeness gap between requests to the same host; different hosts never wait on each other
+SAME_HOST_DELAY = 0.5
+HOST_LOCKS = defaultdict(asyncio.Lock)
+LAST_REQUEST = {}
+
+async def wait_for_host(url):
+    """Hold a request until SAME_HOST_DELAY has passed since the last one to its host"""
+    host = urlparse(url).netloc
+    async with HOST_LOCKS[host]:
+        wait = LAST_REQUEST.get(host, float('-inf')) + SAME_HOST_DELAY - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        LAST_REQUEST[host] = time.monotonic()
+
+def retry_delay(error, attempt):
+    """Seconds to wait before retrying after error, or None if it isn't worth retrying"""
+    if isinstance(error, aiohttp.ClientResponseError):
+        if error.status not in RETRY_STATUSES:
+            return None
+
+        # Honour the server's own backpressure (delta-seconds or an HTTP date)
+        retry_after = (error.headers or {}).get('Retry-After')
+        if retry_after:
+            try:
+                return max(float(retry_after), 0.0)
+            except ValueError:
+                try:
+                    when = parsedate_to_datetime(retry_after)
+                    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+                except (TypeError, ValueError):
+                    pass
+
+    return RETRY_BACKOFF * 2 ** attempt
+
+async def download_with_progress(session, semaphore, url, filepath, name):
     """Download file with aggressive retry"""
 
     if os.path.exists(filepath):
@@ -63,61 +135,104 @@ def download_with_progress(url, filepath, name):
         print(f"✓ Already have: {name} ({size:,} bytes)")
         return True
 
-    print(f"\n📥 {name}")
-    print(f"   {url}")
-
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-            }
-
-            response = requests.get(url, stream=True, timeout=120, headers=headers, allow_redirects=True)
-
-            if response.status_code == 404:
-                print(f"   ❌ 404 Not Found")
-                return False
+    async with semaphore:
+        return await fetch_with_retry(session, url, filepath, name)
 
-            response.raise_for_status()
+def parse_content_range(header):
+    """(first byte, total size) from a Content-Range header, or None if unusable"""
+    try:
+        _, _, rest = header.partition(' ')
+        byte_range, _, total = rest.partition('/')
+        return int(byte_range.split('-')[0]) if byte_range != '*' else None, int(total)
+    except (AttributeError, ValueError):
+        return None
 
-            total = int(response.headers.get('content-length', 0))
+async def fetch_with_retry(session, url, filepath, name):
+    """Stream url to filepath, resuming from the bytes already on disk after a failure"""
+    print(f"\n📥 {name}")
+    print(f"   {url}")
 
-            with open(filepath, 'wb') as f:
-                downloaded = 0
-                start = time.time()
+    # Bytes land in a .part file that only takes the real name once complete, so
+    # a leftover .part (from a failed attempt or an earlier run) is always resumable
+    partial = filepath + '.part'
 
-                for chunk in response.iter_content(chunk_size=1024*1024):  # 1MB chunks
-                    if chunk:
-                        f.write(chunk)
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+            headers = {'Range': f'bytes={offset}-'} if offset else None
+
+            await wait_for_host(url)
+            async with session.get(url, headers=headers, allow_redirects=True) as response:
+                if response.status == 404:
+                    print(f"   ❌ 404 Not Found")
+                    return False
+
+                content_range = parse_content_range(response.headers.get('Content-Range'))
+
+                if response.status == 416 and content_range == (None, offset):
+                    # Everything was already received
+                    os.replace(partial, filepath)
+                    print(f"   ✅ {name}: {offset:,} bytes (already complete)")
+                    return True
+
+                if response.status == 206 and content_range and content_range[0] == offset:
+                    print(f"   ↪️  Resuming {name} at {offset:,} bytes")
+                    total = content_range[1]
+                elif response.status in (206, 416):
+                    # The range doesn't line up with what's on disk
+                    os.remove(partial)
+                    raise IOError(f"HTTP {response.status} when resuming at {offset:,} bytes - restarting")
+                else:
+                    # No range support (or nothing to resume) - start over
+                    response.raise_for_status()
+                    offset = 0
+                    total = response.content_length or 0
+
+                with open(partial, 'ab' if offset else 'wb') as f:
+                    downloaded = offset
+                    last_print = offset
+                    start = time.time()
+
+                    async for chunk in response.content.iter_chunked(1024*1024):  # 1MB chunks
+                        await write_chunk(f, chunk)
                         downloaded += len(chunk)
 
-                        if downloaded % (10*1024*1024) == 0:  # Every 10MB
+                        if downloaded - last_print >= 10*1024*1024:  # Every 10MB
+                            last_print = downloaded
                             elapsed = time.time() - start
-                            speed = downloaded / elapsed / 1024 / 1024 if elapsed > 0 else 0
+                            speed = (downloaded - offset) / elapsed / 1024 / 1024 if elapsed > 0 else 0
                             if total > 0:
                                 pct = downloaded / total * 100
-                                print(f"   {downloaded:,} / {total:,} bytes ({pct:.1f}%) @ {speed:.1f} MB/s", end='\r')
+                                print(f"   {name}: {downloaded:,} / {total:,} bytes ({pct:.1f}%) @ {speed:.1f} MB/s", end='\r')
                             else:
-                                print(f"   {downloaded:,} bytes @ {speed:.1f} MB/s", end='\r')
+                                print(f"   {name}: {downloaded:,} bytes @ {speed:.1f} MB/s", end='\r')
+
+                if total and downloaded < total:
+                    raise IOError(f"connection closed at {downloaded:,} of {total:,} bytes")
 
+            os.replace(partial, filepath)
             final_size = os.path.getsize(filepath)
             elapsed = time.time() - start
-            print(f"\n   ✅ {final_size:,} bytes in {elapsed:.1f}s")
+            print(f"\n   ✅ {name}: {final_size:,} bytes in {elapsed:.1f}s")
             return True
 
         except Exception as e:
-            print(f"   ⚠️  Attempt {attempt+1}/{max_retries} failed: {e}")
-            if attempt < max_retries - 1:
-                print(f"   Retrying in 2 seconds...")
-                time.sleep(2)
-            else:
-                if os.path.exists(filepath):
-                    os.remove(filepath)
+            # Keep the partial file - the next attempt picks up where this one stopped
+            delay = retry_delay(e, attempt)
+            if delay is None or attempt == MAX_RETRIES:
+                print(f"   ❌ {name}: {e}")
                 return False
 
+            print(f"   ⚠️  {name}: attempt {attempt+1}/{MAX_RETRIES + 1} failed: {e}")
+            print(f"   Retrying in {delay:.1f} seconds...")
+            await asyncio.sleep(delay)
+
     return False
 
+# ZIP members worth extracting, and the copy block size
+EXTRACT_EXTENSIONS = ('.pdf', '.txt')
+EXTRACT_CHUNK_SIZE = 1 << 20
+
 def extract_zips():
     """Extract any ZIP files"""
     print("\n" + "="*70)
@@ -127,24 +242,101 @@ def extract_zips():
     for file in Path(DOWNLOAD_DIR).glob("*.zip"):
         print(f"\n📦 Extracting: {file.name}")
         try:
-            extract_dir = DOWNLOAD_DIR / file.stem
+            extract_dir = Path(DOWNLOAD_DIR) / file.stem
             extract_dir.mkdir(exist_ok=True)
+            root = extract_dir.resolve()
 
+            extracted = 0
             with zipfile.ZipFile(file, 'r') as zf:
-                zf.extractall(extract_dir)
-
-            print(f"   ✅ Extracted to: {extract_dir}")
+                for info in zf.infolist():
+                    # Only documents are worth the disk I/O
+                    if info.is_dir() or not info.filename.lower().endswith(EXTRACT_EXTENSIONS):
+                        continue
+
+                    # Never write outside extract_dir (e.g. "../../x.pdf" members)
+                    dest = (extract_dir / info.filename).resolve()
+                    if not dest.is_relative_to(root):
+                        print(f"   ⚠️  Skipping unsafe path: {info.filename}")
+                        continue
+
+                    dest.parent.mkdir(parents=True, exist_ok=True)
+                    with zf.open(info) as src, open(dest, 'wb', buffering=EXTRACT_CHUNK_SIZE) as dst:
+                        shutil.copyfileobj(src, dst, length=EXTRACT_CHUNK_SIZE)
+                    extracted += 1
+
+            print(f"   ✅ Extracted {extracted} documents to: {extract_dir}")
         except Exception as e:
             print(f"   ❌ Failed: {e}")
 
+def walk_pdfs(root):
+    """Yield a DirEntry for every PDF under root; entry.stat() reuses the directory scan"""
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk_pdfs(entry.path)
+            elif entry.name.endswith('.pdf'):
+                yield entry
+
+async def probe_size(session, url, filepath):
+    """Size of the file on disk, else the Content-Length from a HEAD request, else None"""
+    if os.path.exists(filepath):
+        return os.path.getsize(filepath)
+
+    try:
+        async with session.head(url, allow_redirects=True) as response:
+            if response.status == 200:
+                return response.content_length
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        pass
+    return None
+
+async def download_or_link(session, semaphore, url, filepath, name, original, original_path):
+    """Hard-link filepath to the original download when url reports the same size, else download it"""
+    if os.path.exists(filepath):
+        return await download_with_progress(session, semaphore, url, filepath, name)
+
+    size = os.path.getsize(original_path) if await original else None
+    if size and await probe_size(session, url, filepath) == size:
+        try:
+            os.link(original_path, filepath)
+            print(f"🔗 {name}: same {size:,} bytes as {os.path.basename(original_path)} - linked, not downloaded")
+            return True
+        except OSError:
+            pass
+
+    # The original failed (or can't be linked) - this source is the backup
+    return await download_with_progress(session, semaphore, url, filepath, name)
+
+async def download_all():
+    """Download every source concurrently over one pooled session. Returns results in DOWNLOADS order"""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+    connector = aiohttp.TCPConnector(limit=CONNECTION_LIMIT, limit_per_host=CONNECTION_LIMIT_PER_HOST)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=120, sock_read=120)
+
+    async with aiohttp.ClientSession(connector=connector, headers=HEADERS, timeout=timeout) as session:
+        # A source marked mirror_of (the Guardian PDF and its Internet Archive
+        # copy) waits for the original and hard-links to it when the sizes agree.
+        # Only declared mirrors are linked - a matching size alone could alias
+        # two different documents
+        tasks = {}
+        for item in DOWNLOADS:
+            filepath = os.path.join(DOWNLOAD_DIR, item['file'])
+            if 'mirror_of' in item:
+                coro = download_or_link(session, semaphore, item['url'], filepath, item['name'],
+                                        tasks[item['mirror_of']], os.path.join(DOWNLOAD_DIR, item['mirror_of']))
+            else:
+                coro = download_with_progress(session, semaphore, item['url'], filepath, item['name'])
+            tasks[item['file']] = asyncio.ensure_future(coro)
+
+        return await asyncio.gather(*tasks.values())
+
 def main():
     successful = 0
     failed = 0
     skipped = 0
 
-    for item in DOWNLOADS:
+    for item, result in zip(DOWNLOADS, asyncio.run(download_all())):
         filepath = os.path.join(DOWNLOAD_DIR, item['file'])
-        result = download_with_progress(item['url'], filepath, item['name'])
 
         if result:
             successful += 1
@@ -153,8 +345,6 @@ def main():
         else:
             failed += 1
 
-        time.sleep(0.5)
-
     # Extract ZIPs
     extract_zips()
 
@@ -169,7 +359,7 @@ def main():
 
     # List all files
     print("📁 All files in download directory:")
-    all_files = sorted(Path(DOWNLOAD_DIR).rglob("*.pdf"))
+    all_files = sorted(walk_pdfs(DOWNLOAD_DIR), key=lambda entry: entry.path)
     total_size = 0
 
     for f in all_files:
@@ -4,26 +4,41 @@ FBI Vault Epstein Document Downloader
 Downloads all FBI Epstein investigation files from vault.fbi.gov
 """
 
-import requests
+import aiohttp
+import asyncio
 import os
-import time
 from datetime import datetime
 import sqlite3
 from pathlib import Path
 
+# Parts in flight at once, and connection pool limits (total / per host)
+MAX_CONCURRENT_DOWNLOADS = 8
+CONNECTION_LIMIT = 32
+CONNECTION_LIMIT_PER_HOST = 4
+
+# Read/write granularity
+CHUNK_SIZE = 1 << 20
+
+def release_page_cache(fd):
+    """Tell the kernel a freshly written file won't be re-read soon"""
+    # posix_fadvise doesn't exist on macOS, where the cache is left alone
+    if hasattr(os, 'posix_fadvise'):
+        # DONTNEED only drops pages that have already been written back
+        os.fdatasync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
 class FBIVaultDownloader:
     def __init__(self):
         self.base_url = "https://vault.fbi.gov"
         self.download_dir = "fbi_vault_epstein"
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        })
+        }
 
         # Create download directory
         os.makedirs(self.download_dir, exist_ok=True)
 
-    def download_file(self, url, filename):
+    async def download_file(self, session, semaphore, url, filename):
         """Download a file from URL"""
         filepath = os.path.join(self.download_dir, filename)
 
@@ -34,27 +49,30 @@ class FBIVaultDownloader:
                 print(f"✓ Already downloaded: {filename} ({file_size:,} bytes)")
                 return filepath
 
-        try:
-            print(f"⬇️  Downloading: {filename}")
-            response = self.session.get(url, timeout=30, stream=True)
-            response.raise_for_status()
+        async with semaphore:
+            try:
+                print(f"⬇️  Downloading: {filename}")
+                async with session.get(url) as response:
+                    response.raise_for_status()
 
-            # Write file in chunks
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+                    # Write file in chunks
+                    with open(filepath, 'wb', buffering=CHUNK_SIZE) as f:
+                        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                            await asyncio.to_thread(f.write, chunk)
 
-            file_size = os.path.getsize(filepath)
-            print(f"✅ Downloaded: {filename} ({file_size:,} bytes)")
-            time.sleep(1)  # Be polite to FBI servers
-            return filepath
+                        f.flush()
+                        await asyncio.to_thread(release_page_cache, f.fileno())
 
-        except Exception as e:
-            print(f"❌ Error downloading {filename}: {e}")
-            return None
+                file_size = os.path.getsize(filepath)
+                print(f"✅ Downloaded: {filename} ({file_size:,} bytes)")
+                await asyncio.sleep(1)  # Be polite to FBI servers
+                return filepath
+
+            except Exception as e:
+                print(f"❌ Error downloading {filename}: {e}")
+                return None
 
-    def download_epstein_files(self):
+    async def download_epstein_files(self):
         """Download all Epstein FBI vault files"""
 
         # FBI Vault Epstein files - these are the known parts
@@ -92,17 +110,19 @@ class FBIVaultDownloader:
         print(f"Destination: {self.download_dir}/")
         print("=" * 70)
 
-        downloaded = []
-
-        for part_num, url in files:
-            filename = f"FBI_Epstein_Part_{part_num:02d}_of_22.pdf"
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+        connector = aiohttp.TCPConnector(limit=CONNECTION_LIMIT, limit_per_host=CONNECTION_LIMIT_PER_HOST)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30)
 
-            # Try to get the actual PDF download link
-            pdf_url = url.replace('/view', '/@@download/file')
+        async with aiohttp.ClientSession(connector=connector, headers=self.headers, timeout=timeout) as session:
+            results = await asyncio.gather(*(
+                # Try to get the actual PDF download link
+                self.download_file(session, semaphore, url.replace('/view', '/@@download/file'),
+                                   f"FBI_Epstein_Part_{part_num:02d}_of_22.pdf")
+                for part_num, url in files
+            ))
 
-            filepath = self.download_file(pdf_url, filename)
-            if filepath:
-                downloaded.append(filepath)
+        downloaded = [filepath for filepath in results if filepath]
 
         print("\n" + "=" * 70)
         print(f"✅ Download Complete: {len(downloaded)}/{len(files)} files")
@@ -145,7 +165,7 @@ def main():
     print("=" * 70)
 
     # Download files
-    files = downloader.download_epstein_files()
+    files = asyncio.run(downloader.download_epstein_files())
 
     if files:
         print(f"\n✅ Successfully downloaded {len(files)} FBI vault files")
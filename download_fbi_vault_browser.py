@@ -4,10 +4,12 @@ FBI Vault Browser Automation Downloader
 Uses Playwright to bypass Cloudflare protection and download FBI vault files
 """
 
+import aiohttp
 import asyncio
 import os
 import time
 from pathlib import Path
+from yarl import URL
 
 try:
     from playwright.async_api import async_playwright
@@ -18,14 +20,149 @@ except ImportError:
     print("  python3 -m playwright install chromium")
     exit(1)
 
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Parts fetched over plain HTTP at once, and read/write granularity
+MAX_CONCURRENT_DOWNLOADS = 4
+CHUNK_SIZE = 1 << 20
+
+# Browser contexts driving fallback downloads side by side
+BROWSER_CONTEXTS = 4
+
 class FBIVaultBrowserDownloader:
     def __init__(self):
         self.base_url = "https://vault.fbi.gov"
         self.download_dir = os.path.abspath("fbi_vault_epstein")
+        self.total_parts = 22
         os.makedirs(self.download_dir, exist_ok=True)
 
+    def part_filepath(self, part_num):
+        return os.path.join(self.download_dir, f"FBI_Epstein_Part_{part_num:02d}_of_22.pdf")
+
+    def part_url(self, part_num):
+        return f"{self.base_url}/jeffrey-epstein/Jeffrey%20Epstein%20Part%20{part_num:02d}%20of%2022"
+
+    async def pass_cloudflare(self, page, url):
+        """Load a vault page and wait out the Cloudflare check"""
+        # Navigate to the page
+        await page.goto(url, wait_until='networkidle', timeout=60000)
+
+        # Wait for Cloudflare challenge to complete (if present)
+        print("    ⏳ Waiting for page to load (Cloudflare check)...")
+        await page.wait_for_load_state('networkidle')
+        await asyncio.sleep(3)  # Extra wait for Cloudflare
+
+    async def fetch_part(self, session, semaphore, part_num):
+        """Download one part over plain HTTP. Returns 'downloaded', 'blocked' or 'failed'"""
+        filepath = self.part_filepath(part_num)
+        filename = os.path.basename(filepath)
+        download_url = f"{self.part_url(part_num)}/@@download/file"
+
+        async with semaphore:
+            try:
+                print(f"\n📥 [{part_num}/{self.total_parts}] Downloading: {filename}")
+                async with session.get(download_url) as response:
+                    # Cloudflare answers with a challenge page once the clearance cookie expires
+                    if response.status == 403 or response.content_type == 'text/html':
+                        print(f"    🔒 Blocked by Cloudflare: {filename}")
+                        return 'blocked'
+                    response.raise_for_status()
+
+                    with open(filepath, 'wb', buffering=CHUNK_SIZE) as f:
+                        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                            await asyncio.to_thread(f.write, chunk)
+
+                file_size = os.path.getsize(filepath)
+                print(f"    ✅ Downloaded: {filename} ({file_size:,} bytes)")
+
+                # Be nice to FBI servers
+                await asyncio.sleep(2)
+                return 'downloaded'
+
+            except Exception as e:
+                print(f"    ❌ Error ({filename}): {str(e)[:100]}")
+                if os.path.exists(filepath):
+                    os.remove(filepath)  # Delete partial file
+                return 'failed'
+
+    async def fetch_part_in_browser(self, page, part_num):
+        """Download one part by driving the browser. Returns True on success"""
+        filepath = self.part_filepath(part_num)
+        filename = os.path.basename(filepath)
+        url = self.part_url(part_num)
+
+        try:
+            print(f"\n📥 [{part_num}/{self.total_parts}] Downloading in browser: {filename}")
+            print(f"    URL: {url}")
+
+            await self.pass_cloudflare(page, url)
+
+            # Find and click the download link
+            download_link = None
+
+            # Try multiple selectors for download link
+            selectors = [
+                'a[href*="@@download/file"]',
+                'a[href*="at_download/file"]',
+                'a:has-text("Download")',
+                '.documentFirstHeading + div a',
+            ]
+
+            for selector in selectors:
+                try:
+                    download_link = await page.query_selector(selector)
+                    if download_link:
+                        break
+                except:
+                    continue
+
+            if not download_link:
+                # If no link found, try direct download URL
+                download_url = f"{url}/@@download/file"
+                print(f"    ⬇️  Trying direct download: {download_url}")
+
+                # Start waiting for download before navigation
+                async with page.expect_download(timeout=120000) as download_info:
+                    await page.goto(download_url, wait_until='commit')
+                    download = await download_info.value
+            else:
+                # Click the download link
+                print("    🖱️  Clicking download link...")
+                async with page.expect_download(timeout=120000) as download_info:
+                    await download_link.click()
+                    download = await download_info.value
+
+            # Save the download
+            await download.save_as(filepath)
+            file_size = os.path.getsize(filepath)
+            print(f"    ✅ Downloaded: {filename} ({file_size:,} bytes)")
+
+            # Be nice to FBI servers
+            await asyncio.sleep(2)
+            return True
+
+        except Exception as e:
+            print(f"    ❌ Error: {str(e)[:100]}")
+            # Take screenshot for debugging
+            screenshot_path = os.path.join(self.download_dir, f"error_part_{part_num:02d}.png")
+            try:
+                await page.screenshot(path=screenshot_path)
+                print(f"    📸 Screenshot saved: {screenshot_path}")
+            except:
+                pass
+            return False
+
+    async def fetch_part_in_context(self, context, semaphore, part_num):
+        """Download one part in the browser on a fresh page of context"""
+        async with semaphore:
+            page = await context.new_page()
+            try:
+                return await self.fetch_part_in_browser(page, part_num)
+            finally:
+                await page.close()
+
     async def download_all_parts(self):
-        """Download all 22 parts using browser automation"""
+        """Download all 22 parts, using the browser only to get past Cloudflare"""
 
         print("=" * 70)
         print("FBI VAULT BROWSER DOWNLOADER")
@@ -33,6 +170,23 @@ class FBIVaultBrowserDownloader:
         print(f"Download directory: {self.download_dir}")
         print("=" * 70)
 
+        # Track downloads
+        downloaded_count = 0
+        pending = []
+
+        for part_num in range(1, self.total_parts + 1):
+            filepath = self.part_filepath(part_num)
+
+            # Skip if already downloaded
+            if os.path.exists(filepath) and os.path.getsize(filepath) > 100000:
+                print(f"✓ Already exists: {os.path.basename(filepath)} ({os.path.getsize(filepath):,} bytes)")
+                downloaded_count += 1
+            else:
+                pending.append(part_num)
+
+        if not pending:
+            return downloaded_count
+
         async with async_playwright() as p:
             # Launch browser (headless=False to see what's happening)
             print("🌐 Launching browser...")
@@ -43,108 +197,54 @@ class FBIVaultBrowserDownloader:
 
             context = await browser.new_context(
                 accept_downloads=True,
-                user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+                user_agent=USER_AGENT
             )
 
             page = await context.new_page()
 
-            # Track downloads
-            downloaded_count = 0
-            total_parts = 22
-
-            for part_num in range(1, total_parts + 1):
-                filename = f"FBI_Epstein_Part_{part_num:02d}_of_22.pdf"
-                filepath = os.path.join(self.download_dir, filename)
-
-                # Skip if already downloaded
-                if os.path.exists(filepath) and os.path.getsize(filepath) > 100000:
-                    print(f"✓ Already exists: {filename} ({os.path.getsize(filepath):,} bytes)")
-                    downloaded_count += 1
-                    continue
-
-                # Construct URL for this part
-                url = f"{self.base_url}/jeffrey-epstein/Jeffrey%20Epstein%20Part%20{part_num:02d}%20of%2022"
-
-                try:
-                    print(f"\n📥 [{part_num}/{total_parts}] Downloading: {filename}")
-                    print(f"    URL: {url}")
-
-                    # Navigate to the page
-                    await page.goto(url, wait_until='networkidle', timeout=60000)
-
-                    # Wait for Cloudflare challenge to complete (if present)
-                    print("    ⏳ Waiting for page to load (Cloudflare check)...")
-                    await page.wait_for_load_state('networkidle')
-                    await asyncio.sleep(3)  # Extra wait for Cloudflare
-
-                    # Find and click the download link
-                    download_link = None
-
-                    # Try multiple selectors for download link
-                    selectors = [
-                        'a[href*="@@download/file"]',
-                        'a[href*="at_download/file"]',
-                        'a:has-text("Download")',
-                        '.documentFirstHeading + div a',
-                    ]
-
-                    for selector in selectors:
-                        try:
-                            download_link = await page.query_selector(selector)
-                            if download_link:
-                                break
-                        except:
-                            continue
-
-                    if not download_link:
-                        # If no link found, try direct download URL
-                        download_url = f"{url}/@@download/file"
-                        print(f"    ⬇️  Trying direct download: {download_url}")
-
-                        # Start waiting for download before navigation
-                        async with page.expect_download(timeout=120000) as download_info:
-                            await page.goto(download_url, wait_until='commit')
-                            download = await download_info.value
-
-                            # Save the download
-                            await download.save_as(filepath)
-                            file_size = os.path.getsize(filepath)
-                            print(f"    ✅ Downloaded: {filename} ({file_size:,} bytes)")
-                            downloaded_count += 1
-                    else:
-                        # Click the download link
-                        print("    🖱️  Clicking download link...")
-                        async with page.expect_download(timeout=120000) as download_info:
-                            await download_link.click()
-                            download = await download_info.value
-
-                            # Save the download
-                            await download.save_as(filepath)
-                            file_size = os.path.getsize(filepath)
-                            print(f"    ✅ Downloaded: {filename} ({file_size:,} bytes)")
-                            downloaded_count += 1
-
-                    # Be nice to FBI servers
-                    await asyncio.sleep(2)
-
-                except Exception as e:
-                    print(f"    ❌ Error: {str(e)[:100]}")
-                    # Take screenshot for debugging
-                    screenshot_path = os.path.join(self.download_dir, f"error_part_{part_num:02d}.png")
-                    try:
-                        await page.screenshot(path=screenshot_path)
-                        print(f"    📸 Screenshot saved: {screenshot_path}")
-                    except:
-                        pass
-                    continue
+            # One visit solves the challenge; the clearance cookie then covers the whole site
+            try:
+                await self.pass_cloudflare(page, self.part_url(pending[0]))
+            except Exception as e:
+                print(f"    ❌ Error: {str(e)[:100]}")
+
+            jar = aiohttp.CookieJar()
+            jar.update_cookies({c['name']: c['value'] for c in await context.cookies()},
+                               response_url=URL(self.base_url))
+
+            # cf_clearance is only honoured alongside the user agent that earned it
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=60, sock_read=120)
+            async with aiohttp.ClientSession(cookie_jar=jar, headers={'User-Agent': USER_AGENT},
+                                             timeout=timeout) as session:
+                results = await asyncio.gather(*(self.fetch_part(session, semaphore, part_num)
+                                                 for part_num in pending))
+
+            downloaded_count += results.count('downloaded')
+
+            # Fall back to the browser for anything Cloudflare turned away, in several
+            # contexts at once that all start from the first one's cookies
+            blocked = [part_num for part_num, result in zip(pending, results) if result == 'blocked']
+            if blocked:
+                state = await context.storage_state()
+                contexts = [context] + [
+                    await browser.new_context(accept_downloads=True, user_agent=USER_AGENT, storage_state=state)
+                    for _ in range(min(BROWSER_CONTEXTS, len(blocked)) - 1)
+                ]
+                semaphore = asyncio.Semaphore(len(contexts))
+                fetched = await asyncio.gather(*(
+                    self.fetch_part_in_context(contexts[i % len(contexts)], semaphore, part_num)
+                    for i, part_num in enumerate(blocked)
+                ))
+                downloaded_count += sum(fetched)
 
             await browser.close()
 
-            print("\n" + "=" * 70)
-            print(f"✅ DOWNLOAD COMPLETE: {downloaded_count}/{total_parts} files")
-            print("=" * 70)
+        print("\n" + "=" * 70)
+        print(f"✅ DOWNLOAD COMPLETE: {downloaded_count}/{self.total_parts} files")
+        print("=" * 70)
 
-            return downloaded_count
+        return downloaded_count
 
 async def main():
     downloader = FBIVaultBrowserDownloader()
@@ -166,15 +266,15 @@ async def main():
 
         if import_now == 'y':
             print("\n🔄 Starting import process...")
-            import subprocess
-            result = subprocess.run(
-                ['python3', 'bulk_import.py', 'fbi_vault_epstein'],
-                cwd=os.path.dirname(__file__)
-            )
-            if result.returncode == 0:
-                print("\n✅ Files imported successfully!")
+            # Import in-process, extracting the PDFs across all cores
+            from bulk_import import import_documents_to_db
+            stats = import_documents_to_db(downloader.download_dir)
+
+            if stats['errors'] == 0:
+                print(f"\n✅ Files imported successfully! "
+                      f"({stats['imported']} imported, {stats['skipped']} already in database)")
             else:
-                print("\n⚠️  Import had some issues. Check output above.")
+                print(f"\n⚠️  Import had some issues ({stats['errors']} errors). Check output above.")
         else:
             print("\n📝 To import later, run:")
             print("   python3 bulk_import.py fbi_vault_epstein")
@@ -4,9 +4,15 @@ Priority Document Downloader
 Downloads the most critical Epstein documents for investigation
 """
 
-import requests
+import aiohttp
+import asyncio
+import fcntl
+import hashlib
 import os
+import shutil
+import struct
 import time
+from collections import defaultdict
 from urllib.parse import urlparse
 import json
 
@@ -97,8 +103,338 @@ PRIORITY_DOWNLOADS = [
     }
 ]
 
-def download_file(url, filename, category, description=""):
-    """Download a file with progress tracking"""
+# File names per category, fixed as long as PRIORITY_DOWNLOADS is
+CATEGORY_INDEX = defaultdict(list)
+for _doc in PRIORITY_DOWNLOADS:
+    CATEGORY_INDEX[_doc['category']].append(_doc['filename'])
+CATEGORY_INDEX = dict(CATEGORY_INDEX)
+
+# Downloads in flight at once, connection pool limits (total / per host), and
+# the smallest block handed to a single disk write
+MAX_CONCURRENT_DOWNLOADS = 8
+CONNECTION_LIMIT = 16
+CONNECTION_LIMIT_PER_HOST = 4
+CHUNK_SIZE = 1 << 20
+
+# Seconds between redraws of the shared progress line, and the downloads it
+# covers: filename -> [bytes received, expected size or 0 if unknown]
+PROGRESS_INTERVAL = 0.25
+PROGRESS = {}
+
+# Carriage return plus erase-to-end-of-line, so messages replace the progress line
+CLEAR_LINE = '\r\x1b[K'
+
+# Reserve disk space up front for bodies at least this large
+PREALLOCATE_MIN_SIZE = 16 * 1024 * 1024
+
+# Documents listed above this size (MB) are fetched as concurrent byte ranges,
+# one per pooled connection to their host
+RANGE_MIN_SIZE_MB = 100
+RANGE_PARTS = CONNECTION_LIMIT_PER_HOST
+
+# Documents listed above this size (MB) are handed to aria2c when it's installed;
+# it opens several connections per file and never touches Python for the bytes
+ARIA2C = shutil.which('aria2c')
+ARIA2C_MIN_SIZE_MB = 50
+ARIA2C_CONNECTIONS = 8
+
+# Politeness gap between requests to the same host; different hosts never wait on each other
+SAME_HOST_DELAY = 0.25
+HOST_LOCKS = defaultdict(asyncio.Lock)
+LAST_REQUEST = {}
+
+# Byte offsets only line up with the file on disk when the body isn't
+# compressed in transit
+IDENTITY_ENCODING = {'Accept-Encoding': 'identity'}
+
+# Retries for dropped connections and gateway errors, with exponential backoff (seconds)
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = {502, 503, 504}
+
+def is_retryable(error):
+    """Dropped connections, timeouts and gateway errors are worth another try"""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRY_STATUSES
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+async def wait_for_host(url):
+    """Hold a request until SAME_HOST_DELAY has passed since the last one to its host"""
+    host = urlparse(url).netloc
+    async with HOST_LOCKS[host]:
+        wait = LAST_REQUEST.get(host, float('-inf')) + SAME_HOST_DELAY - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        LAST_REQUEST[host] = time.monotonic()
+
+def preallocate(fd, size):
+    """Reserve size bytes for fd up front so the file isn't extended one write at a time"""
+    try:
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(fd, 0, size)
+        elif hasattr(fcntl, 'F_PREALLOCATE'):
+            # macOS: fstore_t {flags, posmode, offset, length, bytesalloc}
+            fcntl.fcntl(fd, fcntl.F_PREALLOCATE,
+                        struct.pack('Iiqqq', fcntl.F_ALLOCATECONTIG, fcntl.F_PEOFPOSMODE, 0, size, 0))
+    except OSError:
+        pass  # Best effort - not every filesystem supports it
+
+async def report_progress():
+    """Redraw one status line for every download in flight, until cancelled"""
+    last_total = sum(downloaded for downloaded, _ in PROGRESS.values())
+    while True:
+        await asyncio.sleep(PROGRESS_INTERVAL)
+        if not PROGRESS:
+            continue
+
+        total = sum(downloaded for downloaded, _ in PROGRESS.values())
+        speed = max(total - last_total, 0) / PROGRESS_INTERVAL / 1024 / 1024
+        last_total = total
+
+        status = ' | '.join(
+            f"{filename} {downloaded / total_size * 100:.0f}%" if total_size
+            else f"{filename} {downloaded / 1024 / 1024:.1f} MB"
+            for filename, (downloaded, total_size) in PROGRESS.items()
+        )
+        print(f"{CLEAR_LINE}   {status} - {speed:.2f} MB/s", end='', flush=True)
+
+async def coalesced(content, size=CHUNK_SIZE):
+    """Regroup a response body into blocks of size bytes (the last may be shorter).
+
+    The socket hands over whatever has arrived - often 64 KiB or less - so
+    writing each piece as it comes costs a thread hop and a syscall apiece.
+    Blocks are views of one buffer allocated per download and refilled in
+    place, so each must be consumed before asking for the next.
+    """
+    buffer = memoryview(bytearray(size))
+    filled = 0
+    async for chunk in content.iter_any():
+        chunk = memoryview(chunk)
+        while chunk:
+            n = min(size - filled, len(chunk))
+            buffer[filled:filled + n] = chunk[:n]
+            filled += n
+            chunk = chunk[n:]
+            if filled == size:
+                yield buffer
+                filled = 0
+    if filled:
+        yield buffer[:filled]
+
+async def download_ranged(session, url, partial, filename, parts=RANGE_PARTS):
+    """Fetch url as parallel byte ranges written in place into partial.
+
+    Returns False, leaving nothing on disk, when the server doesn't serve
+    ranges; the caller then falls back to a plain GET.
+    """
+    async with session.head(url, headers=IDENTITY_ENCODING, allow_redirects=True) as head:
+        if head.status != 200 or head.headers.get('Accept-Ranges') != 'bytes':
+            return False
+        total_size = head.content_length or 0
+        url = head.url  # Skip the redirect chain on every range request
+
+    if total_size == 0:
+        return False
+
+    # Some servers advertise ranges but answer a Range request with the whole body
+    async with session.get(url, headers={**IDENTITY_ENCODING, 'Range': 'bytes=0-0'}) as probe:
+        if probe.status != 206:
+            return False
+
+    ranges = [(i * total_size // parts, (i + 1) * total_size // parts - 1) for i in range(parts)]
+    progress = PROGRESS[filename] = [0, total_size]
+
+    async def fetch_range(start, end):
+        async with session.get(url, headers={**IDENTITY_ENCODING, 'Range': f'bytes={start}-{end}'}) as response:
+            if response.status != 206:
+                raise aiohttp.ClientPayloadError(f"HTTP {response.status} for bytes {start}-{end}")
+
+            offset = start
+            async for chunk in coalesced(response.content):
+                await pwrite_chunk(fd, chunk, offset)
+                offset += len(chunk)
+                progress[0] += len(chunk)
+
+            if offset != end + 1:
+                raise aiohttp.ClientPayloadError(f"range {start}-{end} ended early at byte {offset:,}")
+
+    fd = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        preallocate(fd, total_size)
+        os.ftruncate(fd, total_size)
+        # A failed range cancels its siblings before the descriptor is closed
+        async with asyncio.TaskGroup() as tg:
+            for start, end in ranges:
+                tg.create_task(fetch_range(start, end))
+    except BaseException as e:
+        os.remove(partial)  # Delete partial file
+        if isinstance(e, ExceptionGroup):
+            raise e.exceptions[0]
+        raise
+    finally:
+        os.close(fd)
+
+    return True
+
+async def download_with_aria2c(url, partial):
+    """Fetch url into partial with aria2c, which resumes from its own control file"""
+    process = await asyncio.create_subprocess_exec(
+        ARIA2C, '--continue=true', '--allow-overwrite=true', '--auto-file-renaming=false',
+        '-x', str(ARIA2C_CONNECTIONS), '-s', str(ARIA2C_CONNECTIONS), '-k', '1M',
+        '--summary-interval=0', '--console-log-level=warn',
+        '-d', os.path.dirname(partial), '-o', os.path.basename(partial), url
+    )
+    try:
+        returncode = await process.wait()
+    except asyncio.CancelledError:
+        process.terminate()
+        await process.wait()
+        raise
+
+    if returncode != 0:
+        raise aiohttp.ClientError(f"aria2c exited with status {returncode}")
+
+def parse_content_range(header):
+    """(first byte, total size) from a Content-Range header, or None if unusable"""
+    try:
+        _, _, rest = header.partition(' ')
+        byte_range, _, total = rest.partition('/')
+        return int(byte_range.split('-')[0]) if byte_range != '*' else None, int(total)
+    except (AttributeError, ValueError):
+        return None
+
+def resume_validator(response):
+    """Strong ETag, or failing that Last-Modified, to vouch for a partial body in If-Range"""
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return response.headers.get('Last-Modified')
+
+def file_sha256(path):
+    """sha256 hash object over what's on disk at path, ready for further updates"""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256')
+
+def write_and_hash(f, digest, chunk):
+    f.write(chunk)
+    digest.update(chunk)
+
+async def write_chunk(f, digest, chunk):
+    """Write and hash chunk off the event loop, letting it land even if the caller is cancelled"""
+    write = asyncio.ensure_future(asyncio.to_thread(write_and_hash, f, digest, chunk))
+    try:
+        await asyncio.shield(write)
+    except asyncio.CancelledError:
+        # The .part file is truncated to what was counted as written, so finish first
+        await write
+        raise
+
+async def pwrite_chunk(fd, chunk, offset):
+    """pwrite chunk at offset off the event loop, letting it land even if the caller is cancelled"""
+    write = asyncio.get_running_loop().run_in_executor(None, os.pwrite, fd, chunk, offset)
+    try:
+        await asyncio.shield(write)
+    except asyncio.CancelledError:
+        # fd is closed once every range task has returned, which must not happen
+        # while a thread is still writing to it
+        await write
+        raise
+
+async def fetch_file(session, url, filepath, filename, size_mb=0):
+    """Stream url into filepath with progress tracking, as byte ranges for big documents.
+    Returns the file's SHA-256 hex digest.
+
+    Bytes land in a .part file next to filepath, with the validator of the
+    response that started it alongside. A later attempt, or a later run,
+    picks up from the end of the .part file with If-Range, so a document that
+    changed on the server in the meantime is fetched again from the start.
+    """
+    await wait_for_host(url)
+
+    partial = filepath + '.part'
+    validator_path = partial + '.validator'
+
+    if ARIA2C and size_mb > ARIA2C_MIN_SIZE_MB:
+        await download_with_aria2c(url, partial)
+        os.replace(partial, filepath)
+        return (await asyncio.to_thread(file_sha256, filepath)).hexdigest()
+
+    # Ranges arrive out of order, so those files are hashed once complete. They
+    # also leave holes until every range is in, so a .part file without a
+    # validator (one a killed ranged download left) is never resumed from
+    if (size_mb > RANGE_MIN_SIZE_MB and not os.path.exists(validator_path)
+            and await download_ranged(session, url, partial, filename)):
+        os.replace(partial, filepath)
+        return (await asyncio.to_thread(file_sha256, filepath)).hexdigest()
+
+    headers = dict(IDENTITY_ENCODING)
+    offset = 0
+    if os.path.exists(partial) and os.path.exists(validator_path):
+        with open(validator_path) as v:
+            headers['If-Range'] = v.read().strip()
+        offset = os.path.getsize(partial)
+        headers['Range'] = f'bytes={offset}-'
+
+    async with session.get(url, headers=headers) as response:
+        content_range = parse_content_range(response.headers.get('Content-Range'))
+
+        if response.status == 416 and content_range == (None, offset):
+            # Everything was already received
+            total_size = downloaded = offset
+            digest = await asyncio.to_thread(file_sha256, partial)
+        elif response.status == 206 and content_range and content_range[0] == offset:
+            print(f"{CLEAR_LINE}   ↪️  Resuming {filename} at {offset:,} bytes")
+            total_size = content_range[1]
+        elif response.status in (206, 416):
+            # The range doesn't line up with what's on disk
+            os.remove(partial)
+            raise aiohttp.ClientPayloadError(f"HTTP {response.status} when resuming at {offset:,} bytes - restarting")
+        else:
+            # A 200 means there was nothing to resume, or the document changed since
+            response.raise_for_status()
+            offset = 0
+            total_size = response.content_length or 0
+
+            validator = resume_validator(response)
+            if validator:
+                with open(validator_path, 'w') as v:
+                    v.write(validator)
+            elif os.path.exists(validator_path):
+                os.remove(validator_path)
+
+        if response.status != 416:
+            with open(partial, 'ab' if offset else 'wb') as f:
+                if not offset and total_size >= PREALLOCATE_MIN_SIZE:
+                    preallocate(f.fileno(), total_size)
+
+                # The hash is carried through the write loop rather than re-reading
+                # the file; only a resumed prefix is read back
+                digest = await asyncio.to_thread(file_sha256, partial) if offset else hashlib.sha256()
+                downloaded = offset
+                progress = PROGRESS[filename] = [downloaded, total_size]
+
+                try:
+                    async for chunk in coalesced(response.content):
+                        # Keep disk writes off the event loop so other downloads keep flowing
+                        await write_chunk(f, digest, chunk)
+                        downloaded += len(chunk)
+                        progress[0] = downloaded
+                finally:
+                    # Drop any preallocated space the body didn't fill, so the .part
+                    # file's size is always the offset to resume from
+                    f.truncate(downloaded)
+
+    if downloaded < total_size:
+        raise aiohttp.ClientPayloadError(f"connection closed at {downloaded:,} of {total_size:,} bytes")
+
+    os.replace(partial, filepath)
+    if os.path.exists(validator_path):
+        os.remove(validator_path)
+
+    return digest.hexdigest()
+
+async def download_file(session, semaphore, url, filename, category, description="", size_mb=0, sha256=None):
+    """Download a file with progress tracking, checking it against sha256 when given"""
     filepath = os.path.join(DOWNLOAD_DIR, filename)
 
     # Skip if already downloaded
@@ -107,65 +443,86 @@ def download_file(url, filename, category, description=""):
         print(f"✓ Already downloaded: {filename} ({file_size:,} bytes)")
         return True
 
-    print(f"\n📥 Downloading: {description or filename}")
-    print(f"   URL: {url[:60]}...")
+    async with semaphore:
+        print(f"{CLEAR_LINE}\n📥 Downloading: {description or filename}")
+        print(f"   URL: {url[:60]}...")
 
-    try:
-        # Stream download with progress
-        response = requests.get(url, stream=True, timeout=60)
-        response.raise_for_status()
-
-        total_size = int(response.headers.get('content-length', 0))
-
-        with open(filepath, 'wb') as f:
-            downloaded = 0
-            start_time = time.time()
-
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-
-                    # Progress indicator every 5MB
-                    if downloaded % (5 * 1024 * 1024) == 0 or downloaded == total_size:
-                        elapsed = time.time() - start_time
-                        speed = downloaded / elapsed / 1024 / 1024 if elapsed > 0 else 0
-
-                        if total_size > 0:
-                            percent = (downloaded / total_size) * 100
-                            print(f"   Progress: {downloaded:,} / {total_size:,} bytes ({percent:.1f}%) - {speed:.2f} MB/s", end='\r')
-                        else:
-                            print(f"   Downloaded: {downloaded:,} bytes - {speed:.2f} MB/s", end='\r')
-
-        print()  # New line after progress
-        final_size = os.path.getsize(filepath)
-        elapsed = time.time() - start_time
-        print(f"✅ Downloaded: {filename} ({final_size:,} bytes in {elapsed:.1f}s)")
-        return True
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                start_time = time.time()
+                digest = await fetch_file(session, url, filepath, filename, size_mb)
 
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Failed to download {filename}: {e}")
-        # Clean up partial download
-        if os.path.exists(filepath):
-            os.remove(filepath)
-        return False
-    except KeyboardInterrupt:
-        print(f"\n⚠️  Download interrupted: {filename}")
-        # Clean up partial download
-        if os.path.exists(filepath):
-            os.remove(filepath)
-        raise
+                if sha256 and digest != sha256.lower():
+                    print(f"{CLEAR_LINE}❌ Checksum mismatch for {filename}: expected {sha256}, got {digest}")
+                    os.remove(filepath)
+                    return False
+
+                final_size = os.path.getsize(filepath)
+                elapsed = time.time() - start_time
+                print(f"{CLEAR_LINE}✅ Downloaded: {filename} ({final_size:,} bytes in {elapsed:.1f}s)")
+                print(f"   SHA-256: {digest}")
+                return True
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt < MAX_RETRIES and is_retryable(e):
+                    delay = RETRY_BACKOFF * 2 ** attempt
+                    print(f"{CLEAR_LINE}⚠️  {filename}: {e} - retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+
+                # Any partial download is kept for the next run to resume
+                print(f"{CLEAR_LINE}❌ Failed to download {filename}: {e}")
+                return False
+            except asyncio.CancelledError:
+                print(f"{CLEAR_LINE}⚠️  Download interrupted: {filename} (partial download kept for resume)")
+                raise
+            finally:
+                PROGRESS.pop(filename, None)
+
+async def download_all():
+    """Download every priority document concurrently. Returns results in PRIORITY_DOWNLOADS order"""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+    connector = aiohttp.TCPConnector(limit=CONNECTION_LIMIT, limit_per_host=CONNECTION_LIMIT_PER_HOST)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60)
+
+    # A single reporter draws progress for every download, off the read loops
+    reporter = asyncio.create_task(report_progress())
+
+    # One session for the whole batch so the DOJ parts reuse kept-alive connections
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        try:
+            return await asyncio.gather(*(
+                download_file(
+                    session,
+                    semaphore,
+                    doc['url'],
+                    doc['filename'],
+                    doc['category'],
+                    doc.get('description', doc['name']),
+                    doc.get('size_mb', 0),
+                    doc.get('sha256')
+                )
+                for doc in PRIORITY_DOWNLOADS
+            ))
+        finally:
+            reporter.cancel()
+            print(CLEAR_LINE, end='')
 
 def main():
     print("\n🎯 PRIORITY DOWNLOADS")
     print("-" * 70)
 
-    # Count by priority
-    high_priority = [d for d in PRIORITY_DOWNLOADS if d.get('priority') == 'HIGH']
-    medium_priority = [d for d in PRIORITY_DOWNLOADS if d.get('priority') == 'MEDIUM']
+    # Count by priority in one pass
+    high_priority = 0
+    medium_priority = 0
+    for doc in PRIORITY_DOWNLOADS:
+        if doc.get('priority') == 'HIGH':
+            high_priority += 1
+        elif doc.get('priority') == 'MEDIUM':
+            medium_priority += 1
 
-    print(f"High Priority: {len(high_priority)} documents")
-    print(f"Medium Priority: {len(medium_priority)} documents")
+    print(f"High Priority: {high_priority} documents")
+    print(f"Medium Priority: {medium_priority} documents")
     print()
 
     # Download statistics
@@ -177,27 +534,22 @@ def main():
     print("=" * 70)
 
     try:
-        for doc in PRIORITY_DOWNLOADS:
-            result = download_file(
-                doc['url'],
-                doc['filename'],
-                doc['category'],
-                doc.get('description', doc['name'])
-            )
-
-            if result:
-                if os.path.exists(os.path.join(DOWNLOAD_DIR, doc['filename'])):
-                    successful += 1
-                else:
-                    skipped += 1
-            else:
-                failed += 1
-
-            # Brief pause between downloads
-            time.sleep(1)
-
+        results = asyncio.run(download_all())
     except KeyboardInterrupt:
         print("\n\n⚠️  Download interrupted by user")
+        results = []
+
+    # One directory listing instead of a stat per document per pass
+    present = {entry.name for entry in os.scandir(DOWNLOAD_DIR) if entry.is_file()}
+
+    for doc, result in zip(PRIORITY_DOWNLOADS, results):
+        if result:
+            if doc['filename'] in present:
+                successful += 1
+            else:
+                skipped += 1
+        else:
+            failed += 1
 
     # Summary
     print("\n" + "=" * 70)
@@ -215,16 +567,10 @@ def main():
         print()
         print("📋 Files by category:")
 
-        categories = {}
-        for doc in PRIORITY_DOWNLOADS:
-            filepath = os.path.join(DOWNLOAD_DIR, doc['filename'])
-            if os.path.exists(filepath):
-                cat = doc['category']
-                if cat not in categories:
-                    categories[cat] = []
-                categories[cat].append(doc['filename'])
-
-        for cat, files in sorted(categories.items()):
+        for cat, filenames in sorted(CATEGORY_INDEX.items()):
+            files = [f for f in filenames if f in present]
+            if not files:
+                continue
             print(f"\n   {cat.upper()}:")
             for f in files:
                 print(f"   - {f}")
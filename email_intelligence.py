@@ -9,10 +9,84 @@ from datetime import datetime
 from collections import defaultdict, Counter
 import json
 import hashlib
+import os
+from contextlib import nullcontext
+import pandas as pd
+from multiprocessing import Pool
+
+# Header lines for parse_email_from_text: one anchored alternation per line,
+# dispatched on the header name, instead of a pattern per header
+HEADER_RE = re.compile(r'(From|To|Cc|Subject|Date|Message-ID):(.*)', re.IGNORECASE)
+FROM_VALUE_RE = re.compile(r'\s*(?:([^<]+)\s*)?<?([^>@\s]+@[^>\s]+)>?')
+MSGID_VALUE_RE = re.compile(r'\s*<?([^>]+)>?')
+# Addresses can't contain whitespace, so their matches need no strip()
+ADDRESS_RE = re.compile(r'([^<,\s]+@[^>,\s]+)')
+# First letter spelled out so the engine can skip straight to candidates
+ATTACH_RE = re.compile(r'[aA](?i:ttach(?:ment|ed))|[eE](?i:nclosed)')
+ATTACH_FILE_RE = re.compile(r'([a-zA-Z0-9_-]+\.[a-z]{3,4})')
+
+# Red-flag keywords by category. Single words are stems matched at the start of
+# a word of the lowercased text ('recruit' catches 'recruited', 'settle' catches
+# 'settlement', but 'age' no longer fires on 'message'); '$' and phrases are
+# matched as substrings
+SUSPICIOUS_KEYWORDS = {
+    'minors': ['minor', 'underage', 'young', 'girl', 'teen', 'age'],
+    'secrecy': ['delete', 'destroy', 'confidential', 'secret', 'discreet', 'private'],
+    'payments': ['wire', '$', 'cash', 'payment', 'compensate', 'expense'],
+    'trafficking': ['recruit', 'arrange', 'provide', 'supply', 'traffic'],
+    'travel': ['flight', 'island', 'villa', 'yacht', 'jet', 'pick up'],
+    'cover_up': ['deny', 'settle', 'nda', 'agreement', 'silence', 'witness']
+}
+KEYWORD_CATEGORIES = tuple((category, keyword, keyword.isalpha())
+                           for category, keywords in SUSPICIOUS_KEYWORDS.items()
+                           for keyword in keywords)
+
+# bytes.translate table keeping a-z and turning everything else into a word break
+WORD_BREAKS = bytes(b if 0x61 <= b <= 0x7a else 0x20 for b in range(256))
+
+def keyword_stems(keyword):
+    """Word starts that count as keyword: the keyword, plus 'denie'/'supplie' for a
+    final y and 'deleting'/'arranging' for a final e, which a plain prefix misses"""
+    stems = {keyword}
+    if keyword.endswith('y'):
+        stems.add(keyword[:-1] + 'ie')
+    if keyword.endswith('e'):
+        stems.add(keyword[:-1] + 'ing')
+    return stems
+
+# Every stem of a word keyword, mapped back to its keyword, and the stem lengths
+# to slice each word at
+KEYWORD_STEMS = {stem.encode(): keyword for _, keyword, is_word in KEYWORD_CATEGORIES if is_word
+                 for stem in keyword_stems(keyword)}
+STEM_LENGTHS = sorted({len(stem) for stem in KEYWORD_STEMS})
+
+# Content red flags, matched against lowercased text
+AGE_RE = re.compile(r'\b\d{1,2}\s*(?:year|yr)s?\s*old\b')
+# Leads with a literal so the regex engine can skip ahead; AGE_RE, which has to
+# try every position, only runs on text where this hits
+AGE_HINT_RE = re.compile(r'(?:year|yr)s?\s*old\b')
+# Code words, looked up in the same word set as the keywords
+EUPHEMISMS = frozenset({b'massage', b'spa', b'modeling', b'assistant'})
+MINORS_RE = re.compile(r'\b(?:young|girl|teen|minor|age|underage)\b')
+TRAVEL_RE = re.compile(r'\b(?:flight|island|travel|pick up|airport)\b')
+
+# Reply/forward prefix stripped when grouping emails into threads
+NORM_SUBJ_RE = re.compile(r'^(Re|Fwd|Fw):\s*', re.IGNORECASE)
+
+# Connection settings: WAL so readers don't block the analysis writes and commits
+# don't rewrite a rollback journal, a 64 MiB page cache and 256 MiB of mmap
+DB_PRAGMAS = '''PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=NORMAL;
+                PRAGMA temp_store=MEMORY;
+                PRAGMA cache_size=-65536;
+                PRAGMA mmap_size=268435456;
+                PRAGMA busy_timeout=5000;'''
 
 def get_db():
-    conn = sqlite3.connect('database.db')
+    """Open the database in autocommit mode; writers wrap their work in BEGIN IMMEDIATE/COMMIT"""
+    conn = sqlite3.connect('database.db', isolation_level=None)
     conn.row_factory = sqlite3.Row
+    conn.executescript(DB_PRAGMAS)
     return conn
 
 def init_email_tables():
@@ -65,6 +139,13 @@ def init_email_tables():
                   common_subjects TEXT,
                   UNIQUE(person1, person2))''')
 
+    # One row per recipient, split once at parse time
+    c.execute('''CREATE TABLE IF NOT EXISTS email_recipients
+                 (email_id INTEGER NOT NULL,
+                  kind TEXT NOT NULL CHECK(kind IN ('to', 'cc', 'bcc')),
+                  addr TEXT NOT NULL,
+                  FOREIGN KEY (email_id) REFERENCES emails(id))''')
+
     # Meeting references extracted from emails
     c.execute('''CREATE TABLE IF NOT EXISTS email_meetings
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -84,6 +165,55 @@ def init_email_tables():
                   mention_count INTEGER DEFAULT 0,
                   emails TEXT)''')
 
+    # Indexes for the thread, suspicious-email and sender lookups
+    c.execute('CREATE INDEX IF NOT EXISTS idx_emails_thread ON emails(thread_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_emails_suspicious ON emails(is_suspicious)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_emails_from ON emails(from_address)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_threads_susp ON email_threads(suspicion_score)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_recipients_email ON email_recipients(email_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_recipients_addr ON email_recipients(addr)')
+
+    # Full-text index over the searchable email fields, kept in sync with the emails
+    # table by the triggers; existing emails are only indexed when it is created
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'emails_fts'")
+    fts_exists = c.fetchone() is not None
+    c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+                  subject, body, from_address, to_addresses,
+                  content='emails',
+                  content_rowid='id')''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS emails_fts_insert AFTER INSERT ON emails BEGIN
+                   INSERT INTO emails_fts(rowid, subject, body, from_address, to_addresses)
+                   VALUES (new.id, new.subject, new.body, new.from_address, new.to_addresses);
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS emails_fts_delete AFTER DELETE ON emails BEGIN
+                   INSERT INTO emails_fts(emails_fts, rowid, subject, body, from_address, to_addresses)
+                   VALUES ('delete', old.id, old.subject, old.body, old.from_address, old.to_addresses);
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS emails_fts_update
+                 AFTER UPDATE OF subject, body, from_address, to_addresses ON emails BEGIN
+                   INSERT INTO emails_fts(emails_fts, rowid, subject, body, from_address, to_addresses)
+                   VALUES ('delete', old.id, old.subject, old.body, old.from_address, old.to_addresses);
+                   INSERT INTO emails_fts(rowid, subject, body, from_address, to_addresses)
+                   VALUES (new.id, new.subject, new.body, new.from_address, new.to_addresses);
+                 END''')
+    if not fts_exists:
+        c.execute("INSERT INTO emails_fts(emails_fts) VALUES ('rebuild')")
+
+    # Databases analyzed before email_recipients existed only have the
+    # comma-joined address columns; split those once so recipient queries work
+    # without re-running the analysis
+    c.execute('BEGIN IMMEDIATE')
+    c.execute('''SELECT NOT EXISTS (SELECT 1 FROM email_recipients)
+                        AND EXISTS (SELECT 1 FROM emails WHERE to_addresses != '' OR cc_addresses != '')''')
+    if c.fetchone()[0]:
+        c.executemany('INSERT INTO email_recipients (email_id, kind, addr) VALUES (?, ?, ?)',
+                      [(email_id, kind, addr)
+                       for email_id, to_addrs, cc_addrs in conn.execute(
+                           'SELECT id, to_addresses, cc_addresses FROM emails')
+                       for kind, addrs in (('to', to_addrs), ('cc', cc_addrs))
+                       for addr in (addrs or '').split(',') if addr])
+    c.execute('COMMIT')
+
     conn.commit()
     conn.close()
 
@@ -96,6 +226,10 @@ def parse_email_from_text(text, doc_id):
     - To: Name <email@example.com>
     - Date: Mon, 1 Jan 2024 10:00:00 -0500
     - Subject: Meeting tomorrow
+
+    Headers end at the first blank line after them; header-like lines in the
+    body (quoted replies, forwards) are left as body text. Only the first 50
+    lines are looked at for headers and attachment mentions.
     """
 
     email_data = {
@@ -111,55 +245,56 @@ def parse_email_from_text(text, doc_id):
         'attachments': []
     }
 
-    lines = text.split('\n')
+    # Split off the first 50 lines only; the rest stays in one piece
+    lines = text.split('\n', 50)
+    head_end = len(text) - len(lines[50]) if len(lines) > 50 else len(text)
     body_start = 0
 
-    for i, line in enumerate(lines[:50]):  # Check first 50 lines for headers
+    for i, line in enumerate(lines[:50]):
         line = line.strip()
 
-        # From header
-        from_match = re.match(r'From:\s*(?:([^<]+)\s*)?<?([^>@\s]+@[^>\s]+)>?', line, re.IGNORECASE)
-        if from_match:
-            email_data['from_name'] = from_match.group(1).strip() if from_match.group(1) else None
-            email_data['from_address'] = from_match.group(2).strip()
-            body_start = max(body_start, i + 1)
-
-        # To header
-        to_match = re.match(r'To:\s*(.+)', line, re.IGNORECASE)
-        if to_match:
-            to_addrs = re.findall(r'([^<,\s]+@[^>,\s]+)', to_match.group(1))
-            email_data['to_addresses'].extend([addr.strip() for addr in to_addrs])
-            body_start = max(body_start, i + 1)
-
-        # CC header
-        cc_match = re.match(r'Cc:\s*(.+)', line, re.IGNORECASE)
-        if cc_match:
-            cc_addrs = re.findall(r'([^<,\s]+@[^>,\s]+)', cc_match.group(1))
-            email_data['cc_addresses'].extend([addr.strip() for addr in cc_addrs])
-            body_start = max(body_start, i + 1)
-
-        # Subject
-        subject_match = re.match(r'Subject:\s*(.+)', line, re.IGNORECASE)
-        if subject_match:
-            email_data['subject'] = subject_match.group(1).strip()
-            body_start = max(body_start, i + 1)
-
-        # Date
-        date_match = re.match(r'Date:\s*(.+)', line, re.IGNORECASE)
-        if date_match:
-            email_data['date_sent'] = date_match.group(1).strip()
-            body_start = max(body_start, i + 1)
-
-        # Message-ID
-        msgid_match = re.match(r'Message-ID:\s*<?([^>]+)>?', line, re.IGNORECASE)
-        if msgid_match:
-            email_data['message_id'] = msgid_match.group(1).strip()
-
-        # Attachment mentions
-        if re.search(r'attachment|attached|enclosed', line, re.IGNORECASE):
-            email_data['has_attachments'] = True
-            attachment_match = re.findall(r'([a-zA-Z0-9_-]+\.[a-z]{3,4})', line)
-            email_data['attachments'].extend(attachment_match)
+        # A blank line after the first header ends the header block (RFC 5322)
+        if not line and body_start:
+            break
+
+        header = HEADER_RE.match(line)
+        if header:
+            name = header.group(1).lower()
+            value = header.group(2)
+
+            if name == 'from':
+                from_match = FROM_VALUE_RE.match(value)
+                if from_match:
+                    email_data['from_name'] = from_match.group(1).strip() if from_match.group(1) else None
+                    email_data['from_address'] = from_match.group(2)
+                    body_start = max(body_start, i + 1)
+
+            elif name == 'message-id':
+                msgid_match = MSGID_VALUE_RE.match(value)
+                if msgid_match:
+                    email_data['message_id'] = msgid_match.group(1).strip()
+
+            elif value:
+                if name == 'to':
+                    email_data['to_addresses'].extend(ADDRESS_RE.findall(value))
+                elif name == 'cc':
+                    email_data['cc_addresses'].extend(ADDRESS_RE.findall(value))
+                elif name == 'subject':
+                    email_data['subject'] = value.strip()
+                else:
+                    email_data['date_sent'] = value.strip()
+                body_start = max(body_start, i + 1)
+
+    # Attachment mentions in the first 50 lines: file names from each line with one
+    attach = ATTACH_RE.search(text, 0, head_end)
+    while attach:
+        line_start = text.rfind('\n', 0, attach.start()) + 1
+        line_end = text.find('\n', attach.end(), head_end)
+        if line_end == -1:
+            line_end = head_end
+        email_data['has_attachments'] = True
+        email_data['attachments'].extend(ATTACH_FILE_RE.findall(text, line_start, line_end))
+        attach = ATTACH_RE.search(text, line_end, head_end)
 
     # Extract body (everything after headers)
     email_data['body'] = '\n'.join(lines[body_start:]).strip()
@@ -167,40 +302,42 @@ def parse_email_from_text(text, doc_id):
     # Generate message_id if not present
     if not email_data['message_id'] and email_data['from_address']:
         hash_input = f"{email_data['from_address']}{email_data['subject']}{email_data['date_sent']}"
-        email_data['message_id'] = hashlib.md5(hash_input.encode()).hexdigest()
+        email_data['message_id'] = hashlib.blake2b(hash_input.encode(), digest_size=16).hexdigest()
 
     return email_data
 
 def check_suspicious_content(email_body, subject=''):
     """Check email for suspicious keywords and patterns"""
 
-    suspicious_keywords = {
-        'minors': ['minor', 'underage', 'young', 'girl', 'teen', 'age'],
-        'secrecy': ['delete', 'destroy', 'confidential', 'secret', 'discreet', 'private'],
-        'payments': ['wire', '$', 'cash', 'payment', 'compensate', 'expense'],
-        'trafficking': ['recruit', 'arrange', 'provide', 'supply', 'traffic'],
-        'travel': ['flight', 'island', 'villa', 'yacht', 'jet', 'pick up'],
-        'cover_up': ['deny', 'settle', 'nda', 'agreement', 'silence', 'witness']
-    }
-
     subject = subject or ''
     email_body = email_body or ''
     content = (subject + ' ' + email_body).lower()
     found_keywords = defaultdict(list)
     suspicion_score = 0
 
-    for category, keywords in suspicious_keywords.items():
-        for keyword in keywords:
-            if keyword in content:
-                found_keywords[category].append(keyword)
-                suspicion_score += 1
+    # Tokenize once, then look up each distinct word's prefixes at the stem
+    # lengths instead of scanning the text once per keyword
+    words = set(content.encode('ascii', 'replace').translate(WORD_BREAKS).split())
+    stem_hits = set()
+    for word in words:
+        for length in STEM_LENGTHS:
+            if length > len(word):
+                break
+            keyword = KEYWORD_STEMS.get(word[:length])
+            if keyword:
+                stem_hits.add(keyword)
+
+    for category, keyword, is_word in KEYWORD_CATEGORIES:
+        if keyword in stem_hits if is_word else keyword in content:
+            found_keywords[category].append(keyword)
+            suspicion_score += 1
 
     # Additional red flags
-    if re.search(r'\b\d{1,2}\s*(?:year|yr)s?\s*old\b', content):
+    if AGE_HINT_RE.search(content) and AGE_RE.search(content):
         found_keywords['age_mentions'].append('specific age mentioned')
         suspicion_score += 3
 
-    if re.search(r'\b(?:massage|spa|modeling|assistant)\b', content):
+    if not words.isdisjoint(EUPHEMISMS):
         found_keywords['euphemisms'].append('potential code word')
         suspicion_score += 2
 
@@ -210,6 +347,56 @@ def check_suspicious_content(email_body, subject=''):
         'keywords_found': dict(found_keywords)
     }
 
+# Documents fetched and handed to the parser pool at a time, and per worker task
+PARSE_BATCH_SIZE = 1024
+PARSE_CHUNK_SIZE = 64
+
+# Parsed emails buffered before they are written
+EMAIL_WRITE_BATCH = 1000
+
+def parse_and_check(doc):
+    """Pool worker - parse one (id, content) document and score it. None if it has no sender"""
+    doc_id, content = doc
+    email = parse_email_from_text(content, doc_id)
+    if not email['from_address']:
+        return None
+    return email, check_suspicious_content(email['body'], email.get('subject', ''))
+
+def write_emails(c, email_rows, email_recipients, email_keywords, keyword_tracker):
+    """Insert a batch of parsed emails and their recipients in one transaction, then
+    tally the batch's keywords against the ids the emails were given"""
+    if not email_rows:
+        return
+
+    c.execute('BEGIN IMMEDIATE')
+    c.execute('SELECT COALESCE(MAX(id), 0) FROM emails')
+    last_id = c.fetchone()[0]
+
+    c.executemany('''INSERT INTO emails
+                     (source_doc_id, message_id, from_address, from_name,
+                      to_addresses, cc_addresses, subject, date_sent, body,
+                      has_attachments, attachments, is_suspicious, suspicious_keywords)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', email_rows)
+
+    # AUTOINCREMENT ids only grow and the write lock is held, so this batch's
+    # emails are exactly the rows past last_id
+    email_ids = dict(c.execute('SELECT message_id, id FROM emails WHERE id > ?', (last_id,)))
+
+    c.executemany('INSERT INTO email_recipients (email_id, kind, addr) VALUES (?, ?, ?)',
+                  [(email_ids[message_id], kind, addr)
+                   for message_id, to_addrs, cc_addrs in email_recipients
+                   for kind, addrs in (('to', to_addrs), ('cc', cc_addrs))
+                   for addr in addrs])
+    c.execute('COMMIT')
+
+    for message_id, keywords_found in email_keywords:
+        email_id = email_ids[message_id]
+        for category, keywords in keywords_found.items():
+            for keyword in keywords:
+                keyword_tracker[keyword]['count'] += 1
+                keyword_tracker[keyword]['emails'].append(email_id)
+                keyword_tracker[keyword]['category'] = category
+
 def analyze_suspicious_emails():
     """
     Analyze ALL email documents in the database and identify suspicious ones
@@ -218,83 +405,93 @@ def analyze_suspicious_emails():
     conn = get_db()
     c = conn.cursor()
 
-    # Clear existing email data for fresh analysis
-    c.execute('DELETE FROM emails')
-    c.execute('DELETE FROM email_keywords')
-
-    # Get all documents that have email format (From: and Subject: headers)
-    c.execute('''SELECT id, content, filename
-                 FROM documents
-                 WHERE content LIKE '%From:%' AND content LIKE '%Subject:%'
-                 ORDER BY id''')
-
-    documents = c.fetchall()
-
-    print(f"\nAnalyzing {len(documents)} email documents...")
+    print("\nAnalyzing email documents...")
 
+    documents_scanned = 0
     emails_parsed = 0
     suspicious_count = 0
     keyword_tracker = defaultdict(lambda: {'count': 0, 'emails': []})
 
-    for doc in documents:
-        doc_id = doc['id']
-        content = doc['content']
-        filename = doc['filename']
-
-        # Parse email data
-        email = parse_email_from_text(content, doc_id)
-
-        # Only process if we have minimum required fields
-        if not email['from_address']:
-            continue
-
-        # Check for suspicious content
-        suspicion = check_suspicious_content(email['body'], email.get('subject', ''))
-
-        # Insert email
-        try:
-            c.execute('''INSERT INTO emails
-                         (source_doc_id, message_id, from_address, from_name,
-                          to_addresses, cc_addresses, subject, date_sent, body,
-                          has_attachments, attachments, is_suspicious, suspicious_keywords)
-                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                     (doc_id, email.get('message_id'),
-                      email['from_address'], email.get('from_name'),
-                      ','.join(email['to_addresses']),
-                      ','.join(email['cc_addresses']),
-                      email.get('subject'), email.get('date_sent'),
-                      email['body'], email.get('has_attachments', False),
-                      json.dumps(email.get('attachments', [])),
-                      suspicion['is_suspicious'],
-                      json.dumps(suspicion['keywords_found'])))
-
-            email_id = c.lastrowid
-            emails_parsed += 1
-
-            if suspicion['is_suspicious']:
-                suspicious_count += 1
-
-            # Track keywords
-            for category, keywords in suspicion['keywords_found'].items():
-                for keyword in keywords:
-                    keyword_tracker[keyword]['count'] += 1
-                    keyword_tracker[keyword]['emails'].append(email_id)
-                    keyword_tracker[keyword]['category'] = category
-
-        except sqlite3.IntegrityError:
-            # Duplicate, skip
-            continue
+    # Clear existing email data for fresh analysis; the write lock is then only
+    # held while each batch of rows is written, not for the whole parse
+    c.execute('BEGIN IMMEDIATE')
+    c.execute('DELETE FROM emails')
+    c.execute('DELETE FROM email_recipients')
+    c.execute('DELETE FROM email_keywords')
+    c.execute('COMMIT')
+
+    # Parsed rows are flushed every EMAIL_WRITE_BATCH emails, so no more than a
+    # batch of bodies is ever held; only message ids are kept for the whole run
+    email_rows = []
+    email_recipients = []
+    email_keywords = []
+    seen_message_ids = set()
+
+    # Get all documents that have email format (From: and Subject: headers)
+    docs_cursor = conn.execute('''SELECT id, content
+                                 FROM documents
+                                 WHERE content LIKE '%From:%' AND content LIKE '%Subject:%'
+                                 ORDER BY id''')
+
+    # Parse and score on every core, a batch of documents at a time so only one
+    # batch of contents is held; map keeps document order, so the first copy of
+    # a duplicate still wins. On a single core the pool is only pickling overhead
+    workers = os.cpu_count() or 1
+    with Pool(workers) if workers > 1 else nullcontext() as pool:
+        while batch := docs_cursor.fetchmany(PARSE_BATCH_SIZE):
+            documents_scanned += len(batch)
+            docs = [(doc['id'], doc['content']) for doc in batch]
+            if pool:
+                parsed = pool.map(parse_and_check, docs, chunksize=PARSE_CHUNK_SIZE)
+            else:
+                parsed = map(parse_and_check, docs)
+
+            for result in parsed:
+                # Only process if we have minimum required fields
+                if result is None:
+                    continue
+                email, suspicion = result
+
+                # Duplicate, skip (message_id is UNIQUE, so only the first copy would insert)
+                if email['message_id'] in seen_message_ids:
+                    continue
+                seen_message_ids.add(email['message_id'])
+
+                email_rows.append((email['source_doc_id'], email.get('message_id'),
+                                   email['from_address'], email.get('from_name'),
+                                   ','.join(email['to_addresses']),
+                                   ','.join(email['cc_addresses']),
+                                   email.get('subject'), email.get('date_sent'),
+                                   email['body'], email.get('has_attachments', False),
+                                   json.dumps(email.get('attachments', [])),
+                                   suspicion['is_suspicious'],
+                                   json.dumps(suspicion['keywords_found'])))
+                email_recipients.append((email['message_id'], email['to_addresses'], email['cc_addresses']))
+                email_keywords.append((email['message_id'], suspicion['keywords_found']))
+
+                emails_parsed += 1
+                if suspicion['is_suspicious']:
+                    suspicious_count += 1
+
+                if len(email_rows) >= EMAIL_WRITE_BATCH:
+                    write_emails(c, email_rows, email_recipients, email_keywords, keyword_tracker)
+                    email_rows.clear()
+                    email_recipients.clear()
+                    email_keywords.clear()
+
+    write_emails(c, email_rows, email_recipients, email_keywords, keyword_tracker)
 
     # Insert keyword tracking data
-    for keyword, data in keyword_tracker.items():
-        c.execute('''INSERT INTO email_keywords (keyword, category, mention_count, emails)
+    c.execute('BEGIN IMMEDIATE')
+    c.executemany('''INSERT INTO email_keywords (keyword, category, mention_count, emails)
                      VALUES (?, ?, ?, ?)''',
-                 (keyword, data['category'], data['count'], ','.join(map(str, data['emails']))))
+                  [(keyword, data['category'], data['count'], ','.join(map(str, data['emails'])))
+                   for keyword, data in keyword_tracker.items()])
+    c.execute('COMMIT')
 
-    conn.commit()
     conn.close()
 
-    print(f"✓ Analyzed {emails_parsed} emails")
+    print(f"✓ Analyzed {emails_parsed} emails in {documents_scanned} email documents")
     print(f"✓ Found {suspicious_count} suspicious emails")
 
     return {
@@ -309,82 +506,84 @@ def reconstruct_threads():
     Returns number of threads created
     """
     conn = get_db()
-    conn.isolation_level = None  # Autocommit mode
     c = conn.cursor()
 
     print("\nReconstructing email threads...")
 
     try:
         # Clear existing threads
+        c.execute('BEGIN IMMEDIATE')
         c.execute('DELETE FROM email_threads')
 
-        # Get all emails ordered by subject and date
-        c.execute('''SELECT id, subject, from_address, to_addresses, date_sent,
+        # Get all emails, unsorted - each thread is put in order on its own below
+        c.execute('''SELECT id, subject, from_address, date_sent,
                             body, is_suspicious, suspicious_keywords
-                     FROM emails
-                     ORDER BY subject, date_sent''')
+                     FROM emails''')
 
         emails = c.fetchall()
 
+        recipients = defaultdict(list)
+        for email_id, addr in c.execute("SELECT email_id, addr FROM email_recipients WHERE kind = 'to'"):
+            recipients[email_id].append(addr)
+
         # Group by normalized subject
         threads = defaultdict(list)
 
         for email in emails:
             subject = email['subject'] or 'No Subject'
             # Normalize subject (remove Re:, Fwd:, etc.)
-            normalized_subject = re.sub(r'^(Re|Fwd|Fw):\s*', '', subject, flags=re.IGNORECASE).strip()
+            normalized_subject = NORM_SUBJ_RE.sub('', subject).strip()
             threads[normalized_subject].append(email)
 
-        threads_created = 0
+        thread_rows = []
+        updates = []
 
         for subject, thread_emails in threads.items():
             if len(thread_emails) < 1:
                 continue
 
+            # By raw subject then date, the order the query used to return them in
+            thread_emails.sort(key=lambda e: (e['subject'] or '', e['date_sent'] or ''))
+
             # Collect participants
             participants = set()
             for email in thread_emails:
                 if email['from_address']:
                     participants.add(email['from_address'])
-                if email['to_addresses']:
-                    for addr in email['to_addresses'].split(','):
-                        addr = addr.strip()
-                        if addr:
-                            participants.add(addr)
+                participants.update(recipients[email['id']])
 
             # Calculate suspicion score
             suspicion_score = sum(1 for e in thread_emails if e['is_suspicious'])
 
-            # Check for mentions of minors or travel
-            combined_text = ' '.join(e['body'] or '' for e in thread_emails).lower()
-            has_minors = bool(re.search(r'\b(?:young|girl|teen|minor|age|underage)\b', combined_text))
-            has_travel = bool(re.search(r'\b(?:flight|island|travel|pick up|airport)\b', combined_text))
+            # Check for mentions of minors or travel, stopping at the first email with one
+            has_minors = any(MINORS_RE.search(e['body'].lower()) for e in thread_emails if e['body'])
+            has_travel = any(TRAVEL_RE.search(e['body'].lower()) for e in thread_emails if e['body'])
 
             # Generate thread_id
-            thread_id = f"thread_{hashlib.md5(subject.encode()).hexdigest()[:12]}"
+            thread_id = f"thread_{hashlib.blake2b(subject.encode(), digest_size=6).hexdigest()}"
 
             # Get date range
             dates = [e['date_sent'] for e in thread_emails if e['date_sent']]
             start_date = dates[0] if dates else None
             end_date = dates[-1] if dates else None
 
-            # Insert thread
-            c.execute('''INSERT INTO email_threads
+            thread_rows.append((thread_id, subject, ','.join(participants),
+                                start_date, end_date,
+                                len(thread_emails), has_minors, has_travel, suspicion_score))
+
+            # Emails to tag with this thread_id
+            updates.extend((thread_id, email['id']) for email in thread_emails)
+
+        # Insert threads and tag their emails in one pass each
+        c.executemany('''INSERT INTO email_threads
                          (thread_id, subject, participants, start_date, end_date,
                           message_count, has_minors_mentioned, has_travel_mentioned,
                           suspicion_score)
-                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                     (thread_id, subject, ','.join(participants),
-                      start_date, end_date,
-                      len(thread_emails), has_minors, has_travel, suspicion_score))
-
-            threads_created += 1
-
-            # Update emails with thread_id
-            for email in thread_emails:
-                c.execute('UPDATE emails SET thread_id = ? WHERE id = ?',
-                         (thread_id, email['id']))
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', thread_rows)
+        c.executemany('UPDATE emails SET thread_id = ? WHERE id = ?', updates)
+        threads_created = len(thread_rows)
 
+        c.execute('COMMIT')
         print(f"✓ Reconstructed {threads_created} email threads")
         return threads_created
     finally:
@@ -396,63 +595,47 @@ def build_contact_network():
     Returns number of contact relationships
     """
     conn = get_db()
-    conn.isolation_level = None  # Autocommit mode
     c = conn.cursor()
 
     print("\nBuilding email contact network...")
 
     try:
         # Clear existing
+        c.execute('BEGIN IMMEDIATE')
         c.execute('DELETE FROM email_contacts')
 
-        # Get all emails
-        c.execute('''SELECT from_address, to_addresses, cc_addresses, date_sent, subject
-                     FROM emails
-                     WHERE from_address IS NOT NULL''')
-
-        emails = c.fetchall()
-
-        contacts = defaultdict(lambda: {
-            'count': 0,
-            'first': None,
-            'last': None,
-            'subjects': []
-        })
-
-        for email in emails:
-            from_addr = email['from_address']
-            to_addrs = []
-
-            if email['to_addresses']:
-                to_addrs.extend(email['to_addresses'].split(','))
-            if email['cc_addresses']:
-                to_addrs.extend(email['cc_addresses'].split(','))
-
-            for to_addr in to_addrs:
-                to_addr = to_addr.strip()
-                if not to_addr or '@' not in to_addr:
-                    continue
-
-                # Sort addresses for consistent key
-                key = tuple(sorted([from_addr, to_addr]))
-
-                contacts[key]['count'] += 1
-                contacts[key]['subjects'].append(email['subject'] or 'No Subject')
-
-                if not contacts[key]['first']:
-                    contacts[key]['first'] = email['date_sent']
-                contacts[key]['last'] = email['date_sent']
-
-        # Insert into database
-        for (p1, p2), data in contacts.items():
-            # Get top 5 common subjects
-            subject_counts = Counter(data['subjects'])
-            top_subjects = ','.join([s for s, _ in subject_counts.most_common(5)])
-
-            c.execute('''INSERT INTO email_contacts
+        # One row per (sender, recipient), To before Cc, in email order
+        pairs = pd.read_sql_query('''SELECT e.from_address, r.addr, e.date_sent, e.subject
+                                     FROM email_recipients r
+                                     JOIN emails e ON e.id = r.email_id
+                                     WHERE e.from_address IS NOT NULL
+                                     ORDER BY r.rowid''', conn)
+
+        # Sort addresses for consistent key
+        sender_first = pairs['from_address'] < pairs['addr']
+        pairs = pairs.assign(p1=pairs['from_address'].where(sender_first, pairs['addr']),
+                             p2=pairs['addr'].where(sender_first, pairs['from_address']),
+                             subject=pairs['subject'].fillna('No Subject'))
+
+        contacts = pairs.groupby(['p1', 'p2'], sort=False).agg(
+            count=('subject', 'size'),
+            first=('date_sent', 'first'),
+            last=('date_sent', 'last'),
+            subjects=('subject', list),
+        )
+
+        # Insert into database, with the top 5 common subjects per pair
+        rows = [(p1, p2, count, first, last,
+                 ','.join(s for s, _ in Counter(subjects).most_common(5)))
+                for (p1, p2), count, first, last, subjects in zip(
+                    contacts.index, contacts['count'].tolist(),
+                    contacts['first'].tolist(), contacts['last'].tolist(),
+                    contacts['subjects'])]
+
+        c.executemany('''INSERT INTO email_contacts
                          (person1, person2, email_count, first_contact, last_contact, common_subjects)
-                         VALUES (?, ?, ?, ?, ?, ?)''',
-                     (p1, p2, data['count'], data['first'], data['last'], top_subjects))
+                         VALUES (?, ?, ?, ?, ?, ?)''', rows)
+        c.execute('COMMIT')
 
         print(f"✓ Built network with {len(contacts)} contact relationships")
         return len(contacts)
@@ -489,16 +672,30 @@ def search_emails(query):
     conn = get_db()
     c = conn.cursor()
 
-    search_term = f'%{query}%'
+    # Every word of the query as a prefix match against the email index, best matches first
+    tokens = re.findall(r'\w+', query)
+    fts_query = ' '.join(f'"{token}"*' for token in tokens)
 
-    c.execute('''SELECT id, from_address, from_name, to_addresses, subject, date_sent,
-                        SUBSTR(body, 1, 200) as preview,
-                        is_suspicious, source_doc_id
-                 FROM emails
-                 WHERE body LIKE ? OR subject LIKE ? OR from_address LIKE ? OR to_addresses LIKE ?
-                 ORDER BY date_sent DESC
-                 LIMIT 100''',
-             (search_term, search_term, search_term, search_term))
+    try:
+        c.execute('''SELECT e.id, e.from_address, e.from_name, e.to_addresses, e.subject, e.date_sent,
+                            SUBSTR(e.body, 1, 200) as preview,
+                            e.is_suspicious, e.source_doc_id
+                     FROM emails_fts f
+                     JOIN emails e ON e.id = f.rowid
+                     WHERE emails_fts MATCH ?
+                     ORDER BY f.rank
+                     LIMIT 100''', (fts_query,))
+    except sqlite3.OperationalError:
+        # Email index not built yet (init_email_tables not run) or empty query
+        search_term = f'%{query}%'
+        c.execute('''SELECT id, from_address, from_name, to_addresses, subject, date_sent,
+                            SUBSTR(body, 1, 200) as preview,
+                            is_suspicious, source_doc_id
+                     FROM emails
+                     WHERE body LIKE ? OR subject LIKE ? OR from_address LIKE ? OR to_addresses LIKE ?
+                     ORDER BY date_sent DESC
+                     LIMIT 100''',
+                 (search_term, search_term, search_term, search_term))
 
     results = [dict(row) for row in c.fetchall()]
     conn.close()
@@ -535,22 +732,13 @@ def get_email_statistics():
     conn = get_db()
     c = conn.cursor()
 
-    stats = {}
-
-    c.execute('SELECT COUNT(*) as count FROM emails')
-    stats['total_emails'] = c.fetchone()['count']
-
-    c.execute('SELECT COUNT(*) as count FROM emails WHERE is_suspicious = 1')
-    stats['suspicious_emails'] = c.fetchone()['count']
-
-    c.execute('SELECT COUNT(*) as count FROM email_threads')
-    stats['total_threads'] = c.fetchone()['count']
-
-    c.execute('SELECT COUNT(*) as count FROM email_threads WHERE has_minors_mentioned = 1')
-    stats['threads_with_minors'] = c.fetchone()['count']
-
-    c.execute('SELECT COUNT(*) as count FROM email_contacts')
-    stats['contact_relationships'] = c.fetchone()['count']
+    # All the headline counts in one statement
+    c.execute('''SELECT (SELECT COUNT(*) FROM emails) AS total_emails,
+                        (SELECT COUNT(*) FROM emails WHERE is_suspicious = 1) AS suspicious_emails,
+                        (SELECT COUNT(*) FROM email_threads) AS total_threads,
+                        (SELECT COUNT(*) FROM email_threads WHERE has_minors_mentioned = 1) AS threads_with_minors,
+                        (SELECT COUNT(*) FROM email_contacts) AS contact_relationships''')
+    stats = dict(c.fetchone())
 
     c.execute('''SELECT keyword, mention_count, category
                  FROM email_keywords
@@ -610,24 +798,21 @@ def get_top_email_addresses(limit=10):
     c = conn.cursor()
 
     # Count emails sent and received per address
-    email_activity = defaultdict(int)
-
-    c.execute('SELECT from_address FROM emails WHERE from_address IS NOT NULL')
-    for row in c.fetchall():
-        email_activity[row['from_address']] += 1
-
-    c.execute('SELECT to_addresses FROM emails WHERE to_addresses IS NOT NULL')
-    for row in c.fetchall():
-        for addr in row['to_addresses'].split(','):
-            addr = addr.strip()
-            if addr and '@' in addr:
-                email_activity[addr] += 1
-
+    c.execute('''WITH activity(addr) AS (
+                     SELECT from_address FROM emails WHERE from_address IS NOT NULL
+                     UNION ALL
+                     SELECT addr FROM email_recipients WHERE kind = 'to'
+                 )
+                 SELECT addr, COUNT(*) AS count
+                 FROM activity
+                 GROUP BY addr
+                 ORDER BY count DESC, addr
+                 LIMIT ?''', (limit,))
+
+    top_addresses = [tuple(row) for row in c.fetchall()]
     conn.close()
 
-    # Sort and return top N
-    sorted_addresses = sorted(email_activity.items(), key=lambda x: x[1], reverse=True)
-    return sorted_addresses[:limit]
+    return top_addresses
 
 if __name__ == '__main__':
     print("="*70)
@@ -6,23 +6,73 @@ Creates an actual investigative timeline instead of just date metadata
 """
 
 import sqlite3
+import os
 import re
 from datetime import datetime
 from collections import defaultdict
 import spacy
 
-# Load spaCy model
-try:
-    nlp = spacy.load('en_core_web_sm')
-except:
-    print("Installing spaCy model...")
-    import os
-    os.system('python3 -m spacy download en_core_web_sm')
-    nlp = spacy.load('en_core_web_sm')
+# Pipeline components nothing here reads. attribute_ruler has to stay: it maps
+# the tagger's tags to the token.pos_ used to spot action verbs
+UNUSED_PIPES = ['lemmatizer']
+
+# Characters of each document handed to spaCy
+MAX_DOC_CHARS = 1000000
+
+# Documents per sentencizer batch, candidate sentences per model batch, and
+# processes running the model (one core left for the main loop)
+SPLIT_BATCH_SIZE = 64
+NLP_BATCH_SIZE = 128
+NLP_PROCESSES = max(1, (os.cpu_count() or 1) - 1)
+
+# Event rows buffered before they are written
+EVENT_WRITE_BATCH = 1000
+
+# Connection settings: WAL so the web app can keep reading while events are rewritten,
+# and commits append to the log instead of syncing a rollback journal
+DB_PRAGMAS = '''PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=NORMAL;
+                PRAGMA temp_store=MEMORY;
+                PRAGMA busy_timeout=5000;'''
+
+# Indexes on events, dropped while the table is refilled and rebuilt afterwards
+EVENT_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_events_date ON events(event_date)',
+    'CREATE INDEX IF NOT EXISTS idx_events_type ON events(event_type)',
+)
+
+# Load models lazily, so worker processes that re-import this module (spawn start
+# method) don't each load the model again; spaCy hands them the pipeline itself
+_nlp = None
+_sentencizer = None
+
+def get_nlp():
+    """Lazy load spaCy model"""
+    global _nlp
+    if _nlp is None:
+        try:
+            _nlp = spacy.load('en_core_web_sm', disable=UNUSED_PIPES)
+        except:
+            print("Installing spaCy model...")
+            os.system('python3 -m spacy download en_core_web_sm')
+            _nlp = spacy.load('en_core_web_sm', disable=UNUSED_PIPES)
+    return _nlp
+
+def get_sentencizer():
+    """Lazy load the rule-based sentence splitter used for the first pass over each document;
+    only the sentences that could hold an event go through the full model"""
+    global _sentencizer
+    if _sentencizer is None:
+        _sentencizer = spacy.blank('en')
+        _sentencizer.add_pipe('sentencizer')
+        _sentencizer.max_length = MAX_DOC_CHARS
+    return _sentencizer
 
 def get_db():
-    conn = sqlite3.connect('database.db')
+    """Open the database in autocommit mode; writers wrap their work in BEGIN IMMEDIATE/COMMIT"""
+    conn = sqlite3.connect('database.db', isolation_level=None)
     conn.row_factory = sqlite3.Row
+    conn.executescript(DB_PRAGMAS)
     return conn
 
 def init_events_table():
@@ -43,113 +93,154 @@ def init_events_table():
                   severity INTEGER DEFAULT 0,
                   FOREIGN KEY (doc_id) REFERENCES documents(id))''')
 
-    c.execute('CREATE INDEX IF NOT EXISTS idx_events_date ON events(event_date)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_events_type ON events(event_type)')
+    for index_sql in EVENT_INDEXES:
+        c.execute(index_sql)
 
-    conn.commit()
     conn.close()
     print("✓ Events table initialized")
 
-def extract_date_from_text(text):
-    """Extract the most likely date from a text snippet"""
-    # Common date patterns
-    patterns = [
-        r'(\d{1,2}/\d{1,2}/\d{4})',  # MM/DD/YYYY
-        r'(\d{4}-\d{1,2}-\d{1,2})',  # YYYY-MM-DD
-        r'(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},?\s+\d{4}',  # Month DD, YYYY
-        r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{1,2},?\s+\d{4}',  # Mon DD, YYYY
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            return match.group(0)
-
-    return None
+# Dates written out in a sentence: MM/DD/YYYY, YYYY-MM-DD, Month DD, YYYY and Mon DD, YYYY.
+# Matched against lowercased text, which is cheaper than re.IGNORECASE
+DATE_RE = re.compile(
+    r'(\d{1,2}/\d{1,2}/\d{4})'
+    r'|(\d{4}-\d{1,2}-\d{1,2})'
+    r'|(?:january|february|march|april|may|june|july|august|september|october|november|december)\s+\d{1,2},?\s+\d{4}'
+    r'|(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)\s+\d{1,2},?\s+\d{4}')
+
+# Shapes normalize_date can parse, each with the strptime formats to try for it.
+# Anything that doesn't fit one of them (most spaCy DATE entities) is rejected
+# without calling strptime at all
+DATE_SHAPES = re.compile(
+    r'(\d{1,2}/ ?\d{1,2}/\d{4})'
+    r'|(\d{4}-\d{1,2}- ?\d{1,2})'
+    r'|([^\W\d_]+\s+ ?\d{1,2},\s*\d{4})'
+    r'|( ?\d{1,2}\s+[^\W\d_]+\s+\d{4})')
+DATE_FORMATS = (
+    ('%m/%d/%Y',),
+    ('%Y-%m-%d',),
+    ('%B %d, %Y', '%b %d, %Y'),
+    ('%d %B %Y', '%d %b %Y'),
+)
+
+def extract_date_from_text(text_lower):
+    """Extract the first date written out in a lowercased text snippet"""
+    match = DATE_RE.search(text_lower)
+    return match.group(0) if match else None
 
 def normalize_date(date_str):
     """Convert various date formats to YYYY-MM-DD"""
     if not date_str:
         return None
 
-    formats = [
-        '%m/%d/%Y',
-        '%Y-%m-%d',
-        '%B %d, %Y',
-        '%b %d, %Y',
-        '%d %B %Y',
-        '%d %b %Y',
-    ]
+    date_str = date_str.strip()
+    shape = DATE_SHAPES.fullmatch(date_str)
+    if not shape:
+        return None
 
-    for fmt in formats:
+    for fmt in DATE_FORMATS[shape.lastindex - 1]:
         try:
-            dt = datetime.strptime(date_str.strip(), fmt)
+            dt = datetime.strptime(date_str, fmt)
             return dt.strftime('%Y-%m-%d')
-        except:
+        except ValueError:
             continue
 
     return None
 
-def classify_event_type(text):
-    """Classify the type of event based on keywords"""
-    text_lower = text.lower()
-
-    # Crime-related
-    if any(word in text_lower for word in ['abuse', 'assault', 'rape', 'molest', 'trafficking', 'prostitution', 'victim', 'crime', 'illegal']):
-        return 'CRIME'
-
-    # Travel-related
-    if any(word in text_lower for word in ['flight', 'flew', 'travel', 'airplane', 'airport', 'departed', 'arrived', 'trip']):
-        return 'TRAVEL'
-
-    # Meeting/Communication
-    if any(word in text_lower for word in ['meeting', 'met with', 'spoke with', 'call', 'email', 'message', 'communication', 'discuss']):
-        return 'MEETING'
-
-    # Financial
-    if any(word in text_lower for word in ['payment', 'paid', 'transfer', 'money', 'cash', 'check', 'wire', 'transaction', 'dollar']):
-        return 'FINANCIAL'
-
-    # Legal
-    if any(word in text_lower for word in ['court', 'trial', 'testimony', 'deposition', 'lawsuit', 'judge', 'attorney', 'subpoena']):
-        return 'LEGAL'
-
-    # Investigation
-    if any(word in text_lower for word in ['investigation', 'interview', 'interrogation', 'evidence', 'witness', 'statement']):
-        return 'INVESTIGATION'
-
-    return 'OTHER'
-
-def calculate_severity(text, event_type):
-    """Calculate severity score 0-10 based on keywords"""
-    text_lower = text.lower()
-    severity = 0
-
-    # High severity keywords
-    high_keywords = ['rape', 'assault', 'abuse', 'minor', 'child', 'underage', 'trafficking', 'forced', 'coerced']
-    for keyword in high_keywords:
-        if keyword in text_lower:
-            severity += 3
-
-    # Medium severity keywords
-    medium_keywords = ['illegal', 'crime', 'victim', 'complaint', 'allegation', 'suspect']
-    for keyword in medium_keywords:
-        if keyword in text_lower:
-            severity += 2
-
-    # Low severity keywords
-    low_keywords = ['concern', 'question', 'inquiry', 'review']
-    for keyword in low_keywords:
-        if keyword in text_lower:
-            severity += 1
+# Event types in priority order: a sentence gets the first type with a keyword in it
+EVENT_KEYWORDS = (
+    ('CRIME', ('abuse', 'assault', 'rape', 'molest', 'trafficking', 'prostitution', 'victim', 'crime', 'illegal')),
+    ('TRAVEL', ('flight', 'flew', 'travel', 'airplane', 'airport', 'departed', 'arrived', 'trip')),
+    ('MEETING', ('meeting', 'met with', 'spoke with', 'call', 'email', 'message', 'communication', 'discuss')),
+    ('FINANCIAL', ('payment', 'paid', 'transfer', 'money', 'cash', 'check', 'wire', 'transaction', 'dollar')),
+    ('LEGAL', ('court', 'trial', 'testimony', 'deposition', 'lawsuit', 'judge', 'attorney', 'subpoena')),
+    ('INVESTIGATION', ('investigation', 'interview', 'interrogation', 'evidence', 'witness', 'statement')),
+)
+
+# Severity points per keyword found: high, medium and low severity keywords
+SEVERITY_KEYWORDS = (
+    (3, ('rape', 'assault', 'abuse', 'minor', 'child', 'underage', 'trafficking', 'forced', 'coerced')),
+    (2, ('illegal', 'crime', 'victim', 'complaint', 'allegation', 'suspect')),
+    (1, ('concern', 'question', 'inquiry', 'review')),
+)
+
+# Extra severity points by event type
+SEVERITY_BONUS = {'CRIME': 2, 'INVESTIGATION': 1}
+
+# Event types kept even when they score no severity
+KEPT_EVENT_TYPES = ('CRIME', 'INVESTIGATION', 'LEGAL')
+
+# A sentence without any of these can neither score severity nor classify as a
+# kept type, so it is never worth parsing
+SIGNIFICANT_KEYWORDS = frozenset(
+    [keyword for _, keywords in SEVERITY_KEYWORDS for keyword in keywords]
+    + [keyword for event_type, keywords in EVENT_KEYWORDS if event_type in KEPT_EVENT_TYPES
+       for keyword in keywords])
+
+# Maps a-z to itself and every other byte to a space, for splitting lowercased text into words
+WORD_BREAKS = bytes(b if 0x61 <= b <= 0x7a else 0x20 for b in range(256))
+
+def keyword_stems(keyword):
+    """Prefixes that make a word count as keyword: the keyword itself, plus its -ies
+    plural when it ends in y and its -ing form when it ends in e"""
+    stems = {keyword}
+    if keyword.endswith('y'):
+        stems.add(keyword[:-1] + 'ie')
+    if keyword.endswith('e'):
+        stems.add(keyword[:-1] + 'ing')
+    return stems
+
+# Single-word keywords are stems matched at the start of a word, so 'abuser',
+# 'victimized' and 'molestation' count but 'therapeutic' (rape) and 'recall' (call)
+# don't. Phrases ('met with') are still matched as substrings
+ALL_KEYWORDS = ([keyword for _, keywords in EVENT_KEYWORDS for keyword in keywords]
+                + [keyword for _, keywords in SEVERITY_KEYWORDS for keyword in keywords])
+KEYWORD_STEMS = {stem.encode(): keyword for keyword in ALL_KEYWORDS if keyword.isalpha()
+                 for stem in keyword_stems(keyword)}
+KEYWORD_PHRASES = tuple(keyword for keyword in ALL_KEYWORDS if not keyword.isalpha())
+
+# One pass over the words finds the longest stem starting each one; a stem stands
+# for every keyword whose own stem is a prefix of it, so nested stems still all count
+STEM_RE = re.compile(rb'\b(?:' + b'|'.join(map(re.escape, sorted(KEYWORD_STEMS, key=len, reverse=True))) + rb')')
+STEM_KEYWORDS = {stem: frozenset(keyword for other, keyword in KEYWORD_STEMS.items() if stem.startswith(other))
+                 for stem in KEYWORD_STEMS}
+
+def find_keywords(text_lower):
+    """Return the set of event and severity keywords that start a word in a lowercased text"""
+    words = text_lower.encode('ascii', 'replace').translate(WORD_BREAKS)
+
+    found = set()
+    for stem in STEM_RE.findall(words):
+        found.update(STEM_KEYWORDS[stem])
+
+    found.update(phrase for phrase in KEYWORD_PHRASES if phrase in text_lower)
+    return found
+
+def classify_event(text_lower):
+    """Classify the type of event and score its severity 0-10, based on keywords in lowercased text"""
+    found = find_keywords(text_lower)
+
+    event_type = 'OTHER'
+    for candidate_type, keywords in EVENT_KEYWORDS:
+        if not found.isdisjoint(keywords):
+            event_type = candidate_type
+            break
+
+    severity = SEVERITY_BONUS.get(event_type, 0)
+    for points, keywords in SEVERITY_KEYWORDS:
+        severity += points * len(found.intersection(keywords))
+
+    return event_type, min(severity, 10)  # Cap at 10
+
+def candidate_sentences(doc):
+    """Yield the sentences of a sentencizer-split document that could hold an event"""
+    for sent in doc.sents:
+        sent_text = sent.text.strip()
 
-    # Event type adjustments
-    if event_type == 'CRIME':
-        severity += 2
-    elif event_type == 'INVESTIGATION':
-        severity += 1
+        if len(sent_text) <= 40:
+            continue
 
-    return min(severity, 10)  # Cap at 10
+        if not SIGNIFICANT_KEYWORDS.isdisjoint(find_keywords(sent_text.lower())):
+            yield sent_text
 
 def extract_events_from_document(doc_id, filename, content):
     """Extract events from a single document"""
@@ -157,9 +248,27 @@ def extract_events_from_document(doc_id, filename, content):
         return []
 
     events = []
+    sentences = candidate_sentences(get_sentencizer()(content[:MAX_DOC_CHARS]))
+    for parsed in get_nlp().pipe(sentences, batch_size=NLP_BATCH_SIZE):
+        events.extend(extract_events_from_parsed(parsed, doc_id, filename))
 
-    # Split into sentences
-    doc = nlp(content[:1000000])  # Limit to 1M chars for performance
+    return events
+
+def iter_candidate_sentences(docs, total_docs):
+    """Split streamed documents and yield (sentence, (doc_id, filename)) for each candidate sentence"""
+    texts = ((doc['content'], (doc['id'], doc['filename'])) for doc in docs)
+    split_docs = get_sentencizer().pipe(texts, as_tuples=True, batch_size=SPLIT_BATCH_SIZE)
+
+    for idx, (split, context) in enumerate(split_docs, 1):
+        if idx % 100 == 0:
+            print(f"  Processing {idx}/{total_docs}...")
+
+        for sent_text in candidate_sentences(split):
+            yield sent_text, context
+
+def extract_events_from_parsed(doc, doc_id, filename):
+    """Extract events from a document or sentence spaCy has already parsed"""
+    events = []
 
     # Look for sentences with dates and actions
     for sent in doc.sents:
@@ -179,14 +288,16 @@ def extract_events_from_document(doc_id, filename, content):
 
         # If sentence has people, action, and context, it might be an event
         if people and has_action and len(sent_text) > 40:
-            event_date = dates[0] if dates else extract_date_from_text(sent_text)
+            # Lowercased once for both the date fallback and the keyword checks
+            sent_lower = sent_text.lower()
+
+            event_date = dates[0] if dates else extract_date_from_text(sent_lower)
             normalized_date = normalize_date(event_date) if event_date else None
 
-            event_type = classify_event_type(sent_text)
-            severity = calculate_severity(sent_text, event_type)
+            event_type, severity = classify_event(sent_lower)
 
             # Only include events with some significance
-            if severity > 0 or event_type in ['CRIME', 'INVESTIGATION', 'LEGAL']:
+            if severity > 0 or event_type in KEPT_EVENT_TYPES:
                 events.append({
                     'event_date': normalized_date,
                     'event_type': event_type,
@@ -201,6 +312,18 @@ def extract_events_from_document(doc_id, filename, content):
 
     return events
 
+def write_events(c, rows):
+    """Insert a batch of event rows in one transaction"""
+    if not rows:
+        return
+
+    c.execute('BEGIN IMMEDIATE')
+    c.executemany('''INSERT INTO events
+                     (event_date, event_type, event_description, people_involved,
+                      locations, doc_id, source_filename, context, severity)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', rows)
+    c.execute('COMMIT')
+
 def extract_events_from_all_documents():
     """Extract events from all documents"""
     conn = get_db()
@@ -210,52 +333,59 @@ def extract_events_from_all_documents():
     print("EVENT TIMELINE EXTRACTOR")
     print("="*70)
 
-    # Clear existing events
+    # Clear existing events; the indexes come back once the table is refilled
+    c.execute('BEGIN IMMEDIATE')
     c.execute('DELETE FROM events')
-    conn.commit()
+    c.execute('DROP INDEX IF EXISTS idx_events_date')
+    c.execute('DROP INDEX IF EXISTS idx_events_type')
+    c.execute('COMMIT')
 
-    # Get all documents with content
-    c.execute('''SELECT id, filename, content
-                 FROM documents
+    # Count documents with content for progress, then stream them rather than holding the corpus in memory
+    c.execute('''SELECT COUNT(*) FROM documents
                  WHERE content IS NOT NULL
-                 AND LENGTH(content) > 100
-                 ORDER BY id''')
-
-    docs = c.fetchall()
-    total_docs = len(docs)
+                 AND LENGTH(content) > 100''')
+    total_docs = c.fetchone()[0]
 
     print(f"\nProcessing {total_docs} documents...")
 
+    # Only the part of each document spaCy will see is read
+    docs = conn.execute('''SELECT id, filename, SUBSTR(content, 1, ?) AS content
+                            FROM documents
+                            WHERE content IS NOT NULL
+                            AND LENGTH(content) > 100
+                            ORDER BY id''', (MAX_DOC_CHARS,))
+
     total_events = 0
+    rows = []
 
-    for idx, doc in enumerate(docs, 1):
-        if idx % 100 == 0:
-            print(f"  Processing {idx}/{total_docs}...")
+    # Only candidate sentences reach the full model, in batches across processes; the
+    # (id, filename) context rides along with each sentence
+    sentences = iter_candidate_sentences(docs, total_docs)
+    parsed_sents = get_nlp().pipe(sentences, as_tuples=True, batch_size=NLP_BATCH_SIZE,
+                                  n_process=NLP_PROCESSES)
 
+    for parsed, (doc_id, filename) in parsed_sents:
         try:
-            events = extract_events_from_document(doc['id'], doc['filename'], doc['content'])
+            events = extract_events_from_parsed(parsed, doc_id, filename)
+        except Exception as e:
+            print(f"  Error processing doc {doc_id}: {str(e)[:100]}")
+            continue
 
-            # Insert events into database
-            for event in events:
-                c.execute('''INSERT INTO events
-                             (event_date, event_type, event_description, people_involved,
-                              locations, doc_id, source_filename, context, severity)
-                             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                         (event['event_date'], event['event_type'], event['event_description'],
-                          event['people_involved'], event['locations'], event['doc_id'],
-                          event['source_filename'], event['context'], event['severity']))
+        rows.extend((event['event_date'], event['event_type'], event['event_description'],
+                     event['people_involved'], event['locations'], event['doc_id'],
+                     event['source_filename'], event['context'], event['severity'])
+                    for event in events)
+        total_events += len(events)
 
-                total_events += 1
+        if len(rows) >= EVENT_WRITE_BATCH:
+            write_events(c, rows)
+            rows.clear()
 
-            # Commit every 50 documents
-            if idx % 50 == 0:
-                conn.commit()
+    write_events(c, rows)
 
-        except Exception as e:
-            print(f"  Error processing doc {doc['id']}: {str(e)[:100]}")
-            continue
+    for index_sql in EVENT_INDEXES:
+        c.execute(index_sql)
 
-    conn.commit()
     conn.close()
 
     print(f"\n✓ Extracted {total_events} events from {total_docs} documents")